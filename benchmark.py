@@ -0,0 +1,424 @@
+#!/usr/bin/python
+# ----------------------------------------------------------------------------
+# Benchmarks parser.py with synthetic scenes
+# ----------------------------------------------------------------------------
+'''
+Generates .fire scenes (and the .meta files they need) with a given number
+of nodes, converts them with parser.run() and reports the wall time, the
+time of each phase and the peak memory as JSON
+'''
+from __future__ import division, unicode_literals, print_function
+import sys
+import os
+import json
+import getopt
+import logging
+import imp
+import multiprocessing
+import platform
+import random
+import shutil
+import tempfile
+import time
+
+
+__docformat__ = 'restructuredtext'
+
+PARSER_FILENAME = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'parser.py')
+# parser.py would be shadowed by the built-in 'parser' module
+creator_parser = imp.load_source('creator_parser', PARSER_FILENAME)
+
+# kind of the generated nodes -> weight
+DEFAULT_MIX = {'sprite': 4, 'label': 3, 'button': 1, 'scrollview': 1, 'tiledmap': 1, 'particle': 1}
+
+# sprite frames of the generated bench.png
+SPRITE_FRAMES = 16
+
+
+################################################################################
+#
+# scene generator
+#
+################################################################################
+def make_uuid(rnd):
+    return '%08x-%04x-%04x-%04x-%012x' % (rnd.getrandbits(32), rnd.getrandbits(16), rnd.getrandbits(16), rnd.getrandbits(16), rnd.getrandbits(48))
+
+
+class SceneGenerator(object):
+    '''builds the json array of a .fire file, plus the .meta files and
+       library/uuid-to-mtime.json entries of the assets it uses
+    '''
+    def __init__(self, nodes, depth, fanout, mix, seed):
+        self._nodes = nodes
+        self._depth = depth
+        self._fanout = fanout
+        self._rnd = random.Random(seed)
+        self._kinds = []
+        for kind in sorted(mix):
+            self._kinds.extend([kind] * mix[kind])
+        self._objects = []
+        self._count = 0
+
+        self.uuids = {}
+        self.metas = {}
+        self._sprite_frames = []
+        self._add_assets()
+
+    def _add_asset(self, filename, meta):
+        uuid = make_uuid(self._rnd)
+        meta['uuid'] = uuid
+        self.metas[filename + '.meta'] = meta
+        self.uuids[uuid] = {'asset': 0, 'meta': 0, 'relativePath': filename}
+        return uuid
+
+    def _add_assets(self):
+        texture_uuid = make_uuid(self._rnd)
+        submetas = {}
+        for i in range(SPRITE_FRAMES):
+            uuid = make_uuid(self._rnd)
+            submetas['bench_%02d' % i] = {
+                    'uuid': uuid, 'rawTextureUuid': texture_uuid,
+                    'trimX': (i % 4) * 64, 'trimY': (i // 4) * 64, 'width': 60, 'height': 60,
+                    'rawWidth': 64, 'rawHeight': 64, 'offsetX': 0, 'offsetY': 0, 'rotated': False,
+                    'borderTop': 0, 'borderBottom': 0, 'borderLeft': 0, 'borderRight': 0}
+            self._sprite_frames.append(uuid)
+        self._add_asset('bench.png', {'type': 'sprite', 'subMetas': submetas})
+        self.uuids[texture_uuid] = {'asset': 0, 'meta': 0, 'relativePath': 'bench.png'}
+        self._ttf = self._add_asset('bench.ttf', {})
+        self._tmx = self._add_asset('bench.tmx', {})
+        self._plist = self._add_asset('bench.plist', {})
+
+    def _add(self, obj):
+        self._objects.append(obj)
+        return len(self._objects) - 1
+
+    def _add_node(self, parent, name):
+        rnd = self._rnd
+        self._count += 1
+        return self._add({
+            '__type__': 'cc.Node', '_name': name, '_parent': {'__id__': parent},
+            '_children': [], '_components': [],
+            '_contentSize': {'__type__': 'cc.Size', 'width': rnd.randint(10, 200), 'height': rnd.randint(10, 200)},
+            '_anchorPoint': {'__type__': 'cc.Vec2', 'x': 0.5, 'y': 0.5},
+            '_position': {'__type__': 'cc.Vec2', 'x': rnd.randint(-500, 500), 'y': rnd.randint(-500, 500)},
+            '_color': {'__type__': 'cc.Color', 'r': 255, 'g': 255, 'b': 255, 'a': 255},
+            '_opacity': 255, '_opacityModifyRGB': False, '_cascadeOpacityEnabled': True,
+            '_globalZOrder': 0, '_localZOrder': 0, '_tag': -1,
+            '_rotationX': rnd.choice((0, 0, 0, 45)), '_rotationY': 0,
+            '_scaleX': rnd.choice((1, 1, 1, 0.5)), '_scaleY': 1, '_skewX': 0, '_skewY': 0})
+
+    def _add_child(self, parent, child):
+        self._objects[parent]['_children'].append({'__id__': child})
+
+    def _add_component(self, node, component):
+        component['node'] = {'__id__': node}
+        self._objects[node]['_components'].append({'__id__': self._add(component)})
+
+    def _sprite_component(self):
+        return {'__type__': 'cc.Sprite', '_type': 0,
+                '_spriteFrame': {'__uuid__': self._rnd.choice(self._sprite_frames)}}
+
+    def _label_component(self, text):
+        system_font = self._rnd.random() < 0.5
+        return {'__type__': 'cc.Label', '_N$string': text, '_fontSize': 20, '_lineHeight': 24,
+                '_isSystemFontUsed': system_font,
+                '_N$file': None if system_font else {'__uuid__': self._ttf},
+                '_N$horizontalAlign': 1, '_N$verticalAlign': 1}
+
+    def _make_node(self, parent, kind):
+        '''adds a node of the given kind. Returns the node that holds its
+           children, None if it can't have any
+        '''
+        node = self._add_node(parent, '%s%d' % (kind, self._count))
+        self._add_child(parent, node)
+        if kind == 'sprite':
+            self._add_component(node, self._sprite_component())
+        elif kind == 'label':
+            self._add_component(node, self._label_component('label %d' % self._count))
+        elif kind == 'particle':
+            self._add_component(node, {'__type__': 'cc.ParticleSystem', '_file': {'__uuid__': self._plist}})
+        elif kind == 'tiledmap':
+            self._add_component(node, {'__type__': 'cc.TiledMap', '_tmxFile': {'__uuid__': self._tmx}})
+        elif kind == 'button':
+            self._add_component(node, self._sprite_component())
+            self._add_component(node, {'__type__': 'cc.Button',
+                '_N$normalSprite': {'__uuid__': self._rnd.choice(self._sprite_frames)}})
+            title = self._add_node(node, 'Label')
+            self._add_child(node, title)
+            self._add_component(title, self._label_component('button %d' % self._count))
+            # its only child is the title Label, see Button.to_cpp_add_child()
+            return None
+        elif kind == 'scrollview':
+            # Node -> view -> content. The children go to content
+            self._add_component(node, self._sprite_component())
+            self._add_component(node, {'__type__': 'cc.ScrollView',
+                'horizontal': False, 'vertical': True, 'elastic': True})
+            view = self._add_node(node, 'view')
+            self._add_child(node, view)
+            content = self._add_node(view, 'content')
+            self._add_child(view, content)
+            return content
+        else:
+            raise Exception("Invalid node kind: %s" % kind)
+        return node
+
+    def generate(self):
+        '''returns the json array of the .fire file'''
+        self._add({'__type__': 'cc.SceneAsset', 'scene': {'__id__': 1}})
+        scene = self._add({'__type__': 'cc.Scene', '_name': '', '_parent': None, '_children': [],
+            '_anchorPoint': {'__type__': 'cc.Vec2', 'x': 0, 'y': 0},
+            '_contentSize': {'__type__': 'cc.Size', 'width': 0, 'height': 0},
+            '_color': {'__type__': 'cc.Color', 'r': 255, 'g': 255, 'b': 255, 'a': 255},
+            '_opacity': 255, '_opacityModifyRGB': False, '_cascadeOpacityEnabled': True,
+            '_globalZOrder': 0, '_localZOrder': 0, '_tag': -1})
+
+        canvas = self._add_node(scene, 'Canvas')
+        self._add_child(scene, canvas)
+        self._add_component(canvas, {'__type__': 'cc.Canvas',
+            '_designResolution': {'__type__': 'cc.Size', 'width': 960, 'height': 640},
+            '_fitWidth': False, '_fitHeight': True})
+
+        # breadth first, `fanout` children per node, up to `depth` levels
+        parents = [(scene, 1)]
+        while self._count < self._nodes and parents:
+            next_parents = []
+            for parent, level in parents:
+                for i in range(self._fanout):
+                    if self._count >= self._nodes:
+                        break
+                    node = self._make_node(parent, self._rnd.choice(self._kinds))
+                    if node is not None and level < self._depth:
+                        next_parents.append((node, level + 1))
+            parents = next_parents
+        return self._objects
+
+    def write(self, workdir, name):
+        '''writes assets/<name>.fire, its metas and library/uuid-to-mtime.json
+           under workdir. Returns the .fire filename, relative to workdir
+        '''
+        for d in ('assets', 'library', 'cpp'):
+            os.makedirs(os.path.join(workdir, d))
+        fire_filename = os.path.join('assets', name + '.fire')
+        with open(os.path.join(workdir, fire_filename), 'w') as fd:
+            json.dump(self.generate(), fd)
+        for meta_filename, meta in self.metas.items():
+            with open(os.path.join(workdir, 'assets', meta_filename), 'w') as fd:
+                json.dump(meta, fd)
+        with open(os.path.join(workdir, 'library', 'uuid-to-mtime.json'), 'w') as fd:
+            json.dump(self.uuids, fd)
+        return fire_filename
+
+
+################################################################################
+#
+# benchmark
+#
+################################################################################
+def generate_case(args):
+    '''multiprocessing entry point. Generates a scene in workdir.
+       Returns (.fire filename, number of nodes)
+    '''
+    workdir, name, nodes, depth, fanout, mix, seed = args
+    generator = SceneGenerator(nodes, depth, fanout, mix, seed)
+    fire_filename = generator.write(workdir, name)
+    return fire_filename, generator._count
+
+
+def run_case(args):
+    '''multiprocessing entry point. Converts the scene in a new process,
+       so the peak memory is only the one of this conversion
+    '''
+    workdir, fire_filename, options = args
+    os.chdir(workdir)
+    # parser.py is verbose: keep the report readable
+    level = creator_parser.logger.level
+    creator_parser.logger.setLevel(logging.ERROR)
+    try:
+        start = time.time()
+        creator_parser.run(fire_filename, 'creator_assets/', None, options)
+        wall_time = time.time() - start
+    finally:
+        creator_parser.logger.setLevel(level)
+    return {'wall_time': wall_time,
+            'phases': creator_parser.g_ctx.phase_times,
+            'peak_memory': creator_parser.get_peak_memory(),
+            'output_bytes': sum(os.path.getsize(os.path.join('cpp', f)) for f in os.listdir('cpp'))}
+
+
+def get_size(obj, seen):
+    '''bytes used by obj and what it references, skipping the objects in
+       seen and the raw .fire data of the nodes. Adds them to seen.
+       Iterative: the node trees can be deeper than the recursion limit
+    '''
+    size = 0
+    stack = [obj]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            for k, v in obj.items():
+                stack.append(k)
+                stack.append(v)
+        elif isinstance(obj, (list, tuple, set)):
+            stack.extend(obj)
+        elif not isinstance(obj, (basestring, int, long, float, bool, type(None))):
+            attributes = {}
+            if hasattr(obj, '__dict__'):
+                size += sys.getsizeof(obj.__dict__)
+                attributes.update(obj.__dict__)
+            for cls in type(obj).__mro__:
+                for slot in cls.__dict__.get('__slots__', ()):
+                    if hasattr(obj, slot):
+                        attributes[slot] = getattr(obj, slot)
+            for name in attributes:
+                if name != '_node_data':
+                    stack.append(attributes[name])
+    return size
+
+
+def measure_case(args):
+    '''multiprocessing entry point. Parses the scene like run() does and
+       returns the bytes used by each parsed node
+    '''
+    workdir, fire_filename, options = args
+    os.chdir(workdir)
+    level = creator_parser.logger.level
+    creator_parser.logger.setLevel(logging.ERROR)
+    try:
+        creator_parser.globals_init()
+        g_ctx = creator_parser.g_ctx
+        g_ctx.options = options
+        creator_parser.populate_asset_tables(os.path.dirname(fire_filename))
+        g_ctx.json_data = creator_parser.load_fire_file(fire_filename)
+        creator_parser.build_component_index()
+        scene_obj = creator_parser.Scene(g_ctx.json_data[0]['scene']['__id__'])
+        scene_obj.parse_tree()
+    finally:
+        creator_parser.logger.setLevel(level)
+    # the class constants (CPP_DEFAULTS, enum values...) are not per node
+    seen = set()
+    classes = [creator_parser.Node]
+    while classes:
+        cls = classes.pop()
+        classes.extend(cls.__subclasses__())
+        for value in cls.__dict__.values():
+            if isinstance(value, (tuple, dict)):
+                get_size(value, seen)
+    return {'bytes_per_node': get_size(scene_obj, seen) / sum(g_ctx.node_counts.values())}
+
+
+def in_new_process(func, args):
+    pool = multiprocessing.Pool(1)
+    try:
+        return pool.apply(func, (args,))
+    finally:
+        pool.close()
+        pool.join()
+
+
+def benchmark(sizes, depth, fanout, mix, seed, options, workdir, measure=False):
+    results = []
+    for nodes in sizes:
+        case_dir = os.path.join(workdir, 'bench%d' % nodes)
+        if os.path.exists(case_dir):
+            shutil.rmtree(case_dir)
+        fire_filename, count = in_new_process(generate_case, (case_dir, 'Bench%d' % nodes, nodes, depth, fanout, mix, seed))
+        result = {'nodes': count, 'fire_bytes': os.path.getsize(os.path.join(case_dir, fire_filename))}
+        result.update(in_new_process(run_case, (case_dir, fire_filename, options)))
+        if measure:
+            result.update(in_new_process(measure_case, (case_dir, fire_filename, options)))
+        print("%d nodes: %.2fs, peak memory %.1f MB" % (count, result['wall_time'], (result['peak_memory'] or 0) / (1024 * 1024)), file=sys.stderr)
+        results.append(result)
+    return {'python': platform.python_version(),
+            'parser': creator_parser.get_file_hash(PARSER_FILENAME),
+            'depth': depth,
+            'fanout': fanout,
+            'mix': mix,
+            'seed': seed,
+            'options': options,
+            'results': results}
+
+
+def parse_mix(arg):
+    mix = {}
+    for item in arg.split(','):
+        kind, weight = item.split('=')
+        if kind not in DEFAULT_MIX:
+            raise Exception("Invalid node kind: %s. Valid ones: %s" % (kind, ', '.join(sorted(DEFAULT_MIX))))
+        mix[kind] = int(weight)
+    return mix
+
+
+def help():
+    print("%s v0.1 - benchmarks parser.py with synthetic scenes\n" % os.path.basename(sys.argv[0]))
+    print("Example:\n%s --nodes 1000,10000,100000 --output bench.json" % os.path.basename(sys.argv[0]))
+    print("\nOptions:")
+    print("  -n, --nodes N[,N...]    number of nodes of each scene (default: 1000,10000)")
+    print("  -d, --depth N           levels of the scene graph (default: 6)")
+    print("  --fanout N              children of each node (default: 10)")
+    print("  --mix KIND=W[,KIND=W]   weight of each kind of node (default: %s)" % ','.join('%s=%d' % (k, DEFAULT_MIX[k]) for k in sorted(DEFAULT_MIX)))
+    print("  --seed N                seed of the generator (default: 1)")
+    print("  --node-size             also report the bytes used by each parsed node")
+    print("  -o, --output FILE       write the JSON report to FILE instead of stdout")
+    print("  --workdir DIR           keep the generated scenes in DIR")
+    print("  --low-memory, --binary  passed to parser.py")
+    sys.exit(-1)
+
+
+if __name__ == "__main__":
+    sizes = [1000, 10000]
+    depth = 6
+    fanout = 10
+    mix = DEFAULT_MIX
+    seed = 1
+    measure = False
+    output = None
+    workdir = None
+    options = {}
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], "n:d:o:h", ["nodes=", "depth=", "fanout=", "mix=", "seed=", "output=", "workdir=", "node-size", "low-memory", "binary", "help"])
+        for opt, arg in opts:
+            if opt in ("-n", "--nodes"):
+                sizes = [int(n) for n in arg.split(',')]
+            elif opt in ("-d", "--depth"):
+                depth = int(arg)
+            elif opt == "--fanout":
+                fanout = int(arg)
+            elif opt == "--mix":
+                mix = parse_mix(arg)
+            elif opt == "--node-size":
+                measure = True
+            elif opt == "--seed":
+                seed = int(arg)
+            elif opt in ("-o", "--output"):
+                output = arg
+            elif opt == "--workdir":
+                workdir = os.path.abspath(arg)
+            elif opt == "--low-memory":
+                options['low_memory'] = True
+            elif opt == "--binary":
+                options['binary'] = True
+            elif opt in ("-h", "--help"):
+                help()
+    except getopt.GetoptError, e:
+        print(e)
+        help()
+
+    keep = workdir is not None
+    if workdir is None:
+        workdir = tempfile.mkdtemp(prefix='creator-bench-')
+    try:
+        report = benchmark(sizes, depth, fanout, mix, seed, options, workdir, measure)
+    finally:
+        if not keep:
+            shutil.rmtree(workdir)
+
+    data = json.dumps(report, indent=2, sort_keys=True)
+    if output is None:
+        print(data)
+    else:
+        with open(output, 'w') as fd:
+            fd.write(data + '\n')
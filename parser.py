@@ -8,142 +8,541 @@ Tool that converts Cocos Creator into cocos2d-x
 from __future__ import division, unicode_literals, print_function
 import sys
 import os
+import errno
 import json
+import hashlib
 import glob
+import plistlib
+import xml.etree.ElementTree as ElementTree
 from pprint import pprint
 import getopt
+import multiprocessing
+import multiprocessing.pool
 from sets import Set
-import re
+import struct
+import io
+import time
+import contextlib
+import logging
+import cProfile
+try:
+    import resource
+except ImportError:
+    resource = None
+try:
+    from PIL import Image
+except ImportError:
+    # only needed by --pack-atlas, and by --report for the size of the
+    # textures that are not sprite frames
+    Image = None
 
 
 __docformat__ = 'restructuredtext'
 
-# Some globals (yeah!)
+#
+# Context
+#
+class Context(object):
+    '''State of one .fire -> cpp conversion.
+       A new one is created for each scene, so conversions don't share
+       anything and can run in different processes (see --jobs)
+    '''
+    def __init__(self):
+        # filename of the .fire file to parse
+        self.filename = ""
+        # Emitters that collect the cpp/h data
+        self.cpp = None
+        self.h = None
+
+        # texture of each sprite frame emitted by to_cpp_setup_sprite_frames()
+        self.sprite_frame_textures = {}
+
+        # size in pixels of the textures of the emitted sprite frames: {texture: (width, height)}
+        self.texture_sizes = {}
+
+        # estimated draw calls of the scene: (before, after) --reorder-siblings
+        # see to_cpp_scene()
+        self.draw_calls = None
+
+        # nodes that are not part of the scene graph, with their descendants
+        # see Node.parse_child()
+        self.dropped_nodes = []
+
+        # --report of the scene. see get_scene_report()
+        self.scene_report = None
+
+        # resources loaded by the scene: [(type, filename)]
+        # see to_cpp_preload()
+        self.scene_resources = []
+
+        # the .fire file being parsed
+        self.json_data = []
+
+        # components of each node: {node_idx: {__type__: [component, ...]}}
+        # and the node types guessed from them: {node_idx: __type__}
+        # see build_component_index()
+        self.components = {}
+        self.node_types = {}
+
+        # the .meta files that contain sprite frame info and other data
+        self.meta_data = {}
+
+        # contains the sprite frames: customized version of meta_data
+        # key is the uuid. value is the json container
+        self.sprite_frames = {}
+
+        # sprites that don't belong to any atlas
+        # should be added to the SpriteFrameCache manually
+        self.sprite_without_atlas = {}
+
+        # sprites that belong to atlas files
+        # atlas file should be added to the SpriteFrameCache manually
+        self.sprite_with_atlas = []
+
+        # contains the textures used
+        # key is the uuid. value is the json container
+        self.textures = {}
+
+        # contains the data from library/uuid-to-mtime.json
+        self.uuid = {}
+
+        self.design_resolution = None
+        self.fit_width = False
+        self.fit_height = False
+
+        # path for the assets
+        self.assetpath = ""
+
+        # directory of the .fire file. Paths in the meta files are relative to it
+        self.path = ""
+
+        # Emitters of the atlas pages created by --pack-atlas
+        self.atlas_pages = []
+
+        # frames of the .plist atlases, parsed at build time
+        # key is the relative path of the .plist. see load_atlas_plist()
+        self.atlas_plists = {}
+        # size of their texture in pixels, if the .plist has it
+        self.atlas_sizes = {}
+        # their texture, relative to path, if the .plist names it and it exists
+        self.atlas_textures = {}
+
+        # global unique id for nodes
+        # it is just a number that gets incremented with each new node
+        self.unique_id = 0
+
+        # --virtual-scrollviews: virtualized ScrollViews emitted so far
+        self.virtual_lists = 0
+        # the item factory being emitted. see to_cpp_item_factory()
+        self.item_factory = None
+
+        # --time-sliced: chunks emitted so far, and the unique_id of the
+        # first node of the current one. see to_cpp_time_sliced()
+        self.chunk_count = 0
+        self.chunk_first_id = 0
+
+        # command line options (see run_all)
+        self.options = {}
+
+        # uuids of the sprite frames used by the scene. None means all of them
+        # see Node.collect_sprite_frames()
+        self.used_sprite_frames = None
+
+        # uuids resolved with Node.get_filepath_from_uuid()
+        # the files behind them are dependencies of the scene (see build manifest)
+        self.resolved_uuids = set()
+        # other files read or looked up while generating the scene, relative to path:
+        # font pages, tilesets, atlas textures... see add_dependency()
+        self.read_files = set()
+
+        # property setters emitted and skipped (see Node.CPP_DEFAULTS)
+        self.emitted_properties = 0
+        self.elided_properties = 0
+
+        # seconds spent in each phase of run(). See phase()
+        self.phase_times = {}
+
+        # number of parsed nodes, by get_class_name()
+        self.node_counts = {}
+
+
+#
+# Emitter
+#
+class Emitter(object):
+    '''Collects the generated code of a file in memory.
+       commit() writes it at once, and only if it changed
+    '''
+    def __init__(self, filename, binary=False):
+        self.filename = filename
+        self.binary = binary
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(data)
+
+    def getvalue(self):
+        if self.binary:
+            return b''.join(self._chunks)
+        return ''.join(self._chunks)
+
+    def commit(self):
+        '''returns False if the file already had this content'''
+        data = self.getvalue()
+        mode = 'b' if self.binary else ''
+        if os.path.exists(self.filename):
+            with open(self.filename, 'r' + mode) as fd:
+                if fd.read() == data:
+                    return False
+        write_file_atomically(self.filename, data, 'w' + mode)
+        return True
+
+
+################################################################################
+#
+# Property values
+# Node._properties holds them. They are formatted by the backends
+#
+################################################################################
+class PropertyValue(object):
+    '''typed value of a property. Numbers and bools are stored as they are'''
+    __slots__ = ()
+
+    def fields(self):
+        return tuple(getattr(self, f) for f in self.__slots__)
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.fields() == other.fields()
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return self.to_cpp()
+
+
+class Vec2(PropertyValue):
+    __slots__ = ('x', 'y')
+
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+    def to_cpp(self):
+        return 'Vec2(%g, %g)' % (self.x, self.y)
+
+
+class Size(PropertyValue):
+    __slots__ = ('width', 'height')
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+
+    def to_cpp(self):
+        return 'Size(%g, %g)' % (self.width, self.height)
+
+
+class Rect(PropertyValue):
+    __slots__ = ('x', 'y', 'width', 'height')
+
+    def __init__(self, x, y, width, height):
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+
+    def to_cpp(self):
+        return 'Rect(%g,%g,%g,%g)' % (self.x, self.y, self.width, self.height)
+
+
+class Color3B(PropertyValue):
+    __slots__ = ('r', 'g', 'b')
+
+    def __init__(self, r, g, b):
+        self.r = r
+        self.g = g
+        self.b = b
+
+    def to_cpp(self):
+        return 'Color3B(%d, %d, %d)' % (self.r, self.g, self.b)
+
+
+class Enum(PropertyValue):
+    '''values[index]. values must be in the order of the C++ enum,
+       since the binary backend only stores the index
+    '''
+    __slots__ = ('values', 'index')
+
+    def __init__(self, values, index):
+        self.values = values
+        self.index = index
+
+    def to_cpp(self):
+        return self.values[self.index]
 
-# filename of the .fire file to parse
-g_filename = ""
-# File objects to dump the cpp/h data
-g_file_cpp = None
-g_file_h = None
 
-# Needed resources
-g_resources_needed = set()
+class String(PropertyValue):
+    __slots__ = ('value',)
 
-# the .fire file being parsed
-g_json_data = []
+    def __init__(self, value):
+        self.value = value
 
-# the .meta files that contain sprite frame info and other data
-g_meta_data = {}
+    def to_cpp(self):
+        return '"%s"' % self.value
 
-# contains the sprite frames: customized version of g_meta_data
-# key is the uuid. value is the json container
-g_sprite_frames = {}
 
-# sprites that don't belong to any atlas
-# should be added to the SpriteFrameCache manually
-g_sprite_without_atlas = {}
+class PlistFrame(String):
+    '''name of a sprite frame, for the ui:: setters that take a TextureResType'''
+    __slots__ = ()
 
-# sprites that belong to atlas files
-# atlas file should be added to the SpriteFrameCache manually
-g_sprite_with_atlas = []
+    def to_cpp(self):
+        return '"%s", ui::Widget::TextureResType::PLIST' % self.value
 
-# contains the textures used
-# key is the uuid. value is the json container
-g_textures = {}
 
-# contains the data from library/uuid-to-mtime.json
-g_uuid = {}
+class Properties(object):
+    '''compact version of the _properties dict of a parsed node (see
+       Node.compact()). It iterates in the order the dict did, since some
+       setters depend on it (setSpriteFrame resets the content size).
+       Nodes with the same keys share the tuple of keys
+    '''
+    __slots__ = ('_keys', '_values')
 
-g_design_resolution = None
+    def __init__(self, properties):
+        self._set_keys(tuple(properties))
+        self._values = [properties[k] for k in self._keys]
 
-# path for the assets
-g_assetpath = ""
+    def _set_keys(self, keys):
+        self._keys = g_property_keys.setdefault(keys, keys)
 
-# global unique id for nodes
-# it is just a number that gets incremented with each new node
-g_unique_id = 0
+    def __len__(self):
+        return len(self._keys)
 
+    def __iter__(self):
+        return iter(self._keys)
 
+    def __contains__(self, key):
+        return key in self._keys
+
+    def __getitem__(self, key):
+        try:
+            return self._values[self._keys.index(key)]
+        except ValueError:
+            raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key in self._keys:
+            self._values[self._keys.index(key)] = value
+        else:
+            self._set_keys(self._keys + (key,))
+            self._values.append(value)
+
+    def __delitem__(self, key):
+        i = self._keys.index(key)
+        self._set_keys(self._keys[:i] + self._keys[i+1:])
+        del self._values[i]
+
+    def get(self, key, default=None):
+        return self[key] if key in self._keys else default
+
+    def keys(self):
+        return list(self._keys)
+
+    def items(self):
+        return zip(self._keys, self._values)
+
+
+def to_cpp_value(value):
+    '''C++ expression of a property value'''
+    if isinstance(value, PropertyValue):
+        return value.to_cpp()
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return '%s' % value
+
+
+# Some globals (yeah!)
+
+# version of library/creator-parser-index.json
+# bump it whenever the format of the index changes
+ASSET_INDEX_VERSION = 2
+
+# version of library/creator-parser-manifest.json
+MANIFEST_VERSION = 2
+
+# command line options that don't change the generated code
+RUNTIME_OPTIONS = ('low_memory', 'profile', 'cprofile')
+
+# phases of run(), in order. See phase()
+PHASES = ('uuid', 'metas', 'load', 'parse', 'emit', 'write')
+
+# -v shows the per-node messages (debug). -q only the warnings
+logger = logging.getLogger('creator_parser')
+logger.addHandler(logging.NullHandler())
+
+# fields of the .fire objects that are read by the converters, by __type__
+# --low-memory discards the rest while loading the scene
+FIRE_NODE_FIELDS = ('__type__', '_name', '_children', '_components',
+        '_contentSize', '_enabled', '_anchorPoint', '_cascadeOpacityEnabled',
+        '_color', '_globalZOrder', '_localZOrder', '_opacity', '_opacityModifyRGB',
+        '_position', '_rotationX', '_rotationY', '_scaleX', '_scaleY',
+        '_skewX', '_skewY', '_tag')
+FIRE_FIELDS = {
+    'cc.SceneAsset': ('__type__', 'scene'),
+    'cc.Scene': FIRE_NODE_FIELDS,
+    'cc.Node': FIRE_NODE_FIELDS,
+    'cc.Canvas': ('__type__', '_designResolution', '_fitWidth', '_fitHeight'),
+    'cc.Sprite': ('__type__', '_spriteFrame', '_type'),
+    'cc.Label': ('__type__', '_isSystemFontUsed', '_fontSize', '_lineHeight',
+        '_N$string', '_N$horizontalAlign', '_N$verticalAlign', '_N$file'),
+    'cc.ParticleSystem': ('__type__', '_file'),
+    'cc.TiledMap': ('__type__', '_tmxFile'),
+    'cc.Button': ('__type__', '_N$normalSprite'),
+    'cc.EditBox': ('__type__', '_N$backgroundImage', '_N$returnType',
+        '_N$inputFlag', '_N$inputMode', '_N$fontSize', '_N$fontColor',
+        '_N$placeholder', '_N$placeholderFontSize', '_N$placeholderFontColor',
+        '_N$maxLength', '_string'),
+    'cc.ProgressBar': ('__type__', '_N$progress'),
+    'cc.ScrollView': ('__type__', 'horizontal', 'vertical', 'elastic'),
+}
+
+# context of the conversion being run
+g_ctx = Context()
+
+# tuples of property keys shared by the Properties objects
+g_property_keys = {}
+
+# --watch keeps the asset indexes and the loaded scenes between conversions:
+# {'indexes': {filename: index}, 'scenes': {filename: (stamp, json_data)}}
+# None when not watching
+g_memory_cache = None
+
+# seconds between two polls of the watched files
+WATCH_INTERVAL = 0.5
+
+# threads reading the .meta files. Decoding holds the GIL: more threads
+# than cores only slows it down
+META_SCAN_THREADS = min(8, multiprocessing.cpu_count())
 
 def globals_init():
-    global g_filename, g_json_data, g_meta_data
-    global g_file_cpp, g_file_h
-    global g_sprite_frames, g_textures, g_uuid
-    global g_sprite_without_atlas, g_sprite_with_atlas
-    global g_design_resolution, g_resources_needed
-    global g_assetpath
-    global g_unique_id
-
-    g_filename = ""
-    g_json_data = []
-    g_meta_data = {}
-    g_sprite_frames = {}
-    g_sprite_without_atlas = {}
-    g_sprite_with_atlas = []
-    g_textures = {}
-    g_uuid = {}
-    g_design_resolution = None
-    g_file_cpp = None
-    g_file_h = None
-    g_resources_needed = set()
-    g_assetpath = ""
-    g_unique_id = 0
+    global g_ctx
+
+    g_ctx = Context()
+
+
+def count_json_descendants(node):
+    '''number of descendants of a node of g_ctx.json_data'''
+    count = 0
+    stack = [node]
+    while stack:
+        for child_idx in stack.pop().get('_children', []):
+            count += 1
+            stack.append(g_ctx.json_data[child_idx['__id__']])
+    return count
+
+
+def walk_tree(root, visit, parent=None, depth=0, sibling_idx=0):
+    '''pre-order traversal of the tree at root, the children in order.
+       Uses a stack instead of recursion: no limit on the depth.
+       visit(node, parent, depth, sibling_idx) is called for every node, and
+       what it returns is the `parent` of its children. None skips them
+    '''
+    stack = [(root, parent, depth, sibling_idx)]
+    while stack:
+        node, parent, depth, sibling_idx = stack.pop()
+        parent = visit(node, parent, depth, sibling_idx)
+        if parent is not None:
+            children = node._children
+            for idx in range(len(children) - 1, -1, -1):
+                stack.append((children[idx], parent, depth + 1, idx))
 
 
 #
 # Node
 #
 class Node(object):
+    # scenes can have millions of nodes: no per-instance __dict__.
+    # Subclasses list their own attributes too
+    __slots__ = ('_node_idx', '_node_data', '_children', '_properties', '_cpp_node_name', '_cpp_node_id', '_cpp_parent_name')
+
+    # False if the node can draw outside of its content size (see get_node_box())
+    BOUNDED = True
+
+    # ScrollView, Button & ProgressBar should be before Sprite
+    SUPPORTED_COMPONENTS = ('cc.Button', 'cc.ProgressBar', 'cc.ScrollView', 'cc.EditBox', 'cc.Label', 'cc.Sprite', 'cc.ParticleSystem', 'cc.TiledMap', 'cc.Canvas')
+
+    # values that the engine already has after create(): setting them is a no-op.
+    # Only listed when they are the same for every instance of the class
+    CPP_DEFAULTS = {
+            'setAnchorPoint': Vec2(0, 0),
+            'setCascadeOpacityEnabled': False,
+            'setColor': Color3B(255, 255, 255),
+            'setGlobalZOrder': 0,
+            'setLocalZOrder': 0,
+            'setOpacity': 255,
+            'setOpacityModifyRGB': False,
+            'setPosition': Vec2(0, 0),
+            'setRotationSkewX': 0,
+            'setRotationSkewY': 0,
+            'setScaleX': 1,
+            'setScaleY': 1,
+            'setSkewX': 0,
+            'setSkewY': 0,
+            'setTag': -1}
+    # ui::Widget::init() enables the cascade opacity and centers the anchor point
+    WIDGET_CPP_DEFAULTS = dict(CPP_DEFAULTS, setCascadeOpacityEnabled=True, setAnchorPoint=Vec2(0.5, 0.5))
+
     @classmethod
-    def get_node_components(cls, node):
-        idxs = node['_components']
-        components = []
-        for idx in idxs:
-            idx_num = idx['__id__']
-            components.append(g_json_data[idx_num])
-        return components
+    def get_node_components(cls, node_idx):
+        '''components of the node, grouped by __type__'''
+        return g_ctx.components.get(node_idx, {})
 
     @classmethod
-    def get_node_component_of_type(cls, node, t):
-        components = Node.get_node_components(node)
-        for c in components:
-            if c['__type__'] == t:
-                return c
+    def get_node_component_of_type(cls, node_idx, t):
+        components = g_ctx.components.get(node_idx)
+        if components is not None and t in components:
+            return components[t][0]
         return None
 
     @classmethod
     def guess_type_from_components(cls, components):
-        # ScrollView, Button & ProgressBar should be before Sprite
-        supported_components = ('cc.Button', 'cc.ProgressBar', 'cc.ScrollView', 'cc.EditBox', 'cc.Label', 'cc.Sprite', 'cc.ParticleSystem', 'cc.TiledMap', 'cc.Canvas')
-        node_components = [x['__type__'] for x in components]
-        for supported in supported_components:
-            if supported in node_components:
-                print("Choosen %s from %s" % (supported, node_components))
+        for supported in Node.SUPPORTED_COMPONENTS:
+            if supported in components:
                 return supported
-        print("Unknown components: %s" % node_components)
         return 'unknown'
 
+    @classmethod
+    def get_node_type(cls, node_idx):
+        node_type = g_ctx.node_types.get(node_idx, 'unknown')
+        # called for every node: don't even build the messages if not needed
+        if logger.isEnabledFor(logging.DEBUG):
+            if node_type != 'unknown':
+                logger.debug("Choosen %s from %s", node_type, list(g_ctx.components[node_idx]))
+            else:
+                logger.debug("Unknown components: %s", list(g_ctx.components.get(node_idx, {})))
+        return node_type
+
     @classmethod
     def create_node(cls, node_type, node_idx):
         n = None
         if node_type == 'cc.Sprite':
-            n = Sprite(g_json_data[node_idx])
+            n = Sprite(node_idx)
         elif node_type == 'cc.Label':
-            n = Label(g_json_data[node_idx])
+            n = Label(node_idx)
         elif node_type == 'cc.ParticleSystem':
-            n = ParticleSystem(g_json_data[node_idx])
+            n = ParticleSystem(node_idx)
         elif node_type == 'cc.TiledMap':
-            n = TiledMap(g_json_data[node_idx])
+            n = TiledMap(node_idx)
         elif node_type == 'cc.Canvas':
-            n = Canvas(g_json_data[node_idx])
+            n = Canvas(node_idx)
         elif node_type == 'cc.EditBox':
-            n = EditBox(g_json_data[node_idx])
+            n = EditBox(node_idx)
         elif node_type == 'cc.ProgressBar':
-            n = ProgressBar(g_json_data[node_idx])
+            n = ProgressBar(node_idx)
         elif node_type == 'cc.Button':
-            n = Button(g_json_data[node_idx])
+            n = Button(node_idx)
         elif node_type == 'cc.ScrollView':
-            n = ScrollView(g_json_data[node_idx])
+            n = ScrollView(node_idx)
         if n is not None:
             n.parse_properties()
         return n
@@ -151,16 +550,20 @@ class Node(object):
     @classmethod
     def get_filepath_from_uuid(self, uuid):
         filepath = None
-        if uuid in g_uuid:
-            filepath = g_uuid[uuid]['relativePath']
-        elif uuid in g_sprite_frames:
-            filepath = g_sprite_frames[uuid]['frameName']
+        g_ctx.resolved_uuids.add(uuid)
+        if uuid in g_ctx.uuid:
+            filepath = g_ctx.uuid[uuid]['relativePath']
+        elif uuid in g_ctx.sprite_frames:
+            filepath = g_ctx.sprite_frames[uuid]['frameName']
         return filepath
 
-    def __init__(self, data):
-        self._node_data = data
+    def __init__(self, node_idx):
+        self._node_idx = node_idx
+        self._node_data = g_ctx.json_data[node_idx]
         self._children = []
         self._properties = {}
+        class_name = self.get_class_name()
+        g_ctx.node_counts[class_name] = g_ctx.node_counts.get(class_name, 0) + 1
 
         data = self._node_data
         self.add_property_size('setContentSize', "_contentSize", data)
@@ -184,6 +587,7 @@ class Node(object):
 
 
         self._cpp_node_name = ""
+        self._cpp_node_id = -1
         self._cpp_parent_name = ""
 
     def add_property(self, newkey, value, keys_to_parse):
@@ -195,14 +599,13 @@ class Node(object):
 
     def add_property_str(self, newkey, value, data):
         if value in data:
-            new_value = data.get(value)
-            self._properties[newkey] = '"' + new_value + '"'
+            self._properties[newkey] = String(data.get(value))
 
     def add_property_size(self, newkey, value, data):
         if value in data:
             w = data.get(value)['width']
             h = data.get(value)['height']
-            self._properties[newkey] = 'Size(%g, %g)' % (w,h)
+            self._properties[newkey] = Size(w, h)
 
     def add_property_int(self, newkey, value, data):
         if value in data:
@@ -213,79 +616,225 @@ class Node(object):
         if value in data:
             x = data.get(value)['x']
             y = data.get(value)['y']
-            self._properties[newkey] = 'Vec2(%g, %g)' % (x,y)
+            self._properties[newkey] = Vec2(x, y)
 
     def add_property_rgb(self, newkey, value, data):
         if value in data:
             r = data.get(value)['r']
             g = data.get(value)['g']
             b = data.get(value)['b']
-            self._properties[newkey] = 'Color3B(%d, %d, %d)' %(r,g,b)
+            self._properties[newkey] = Color3B(r, g, b)
 
     def add_property_bool(self, newkey, value, data):
         if value in data:
-            b = str(data.get(value)).lower()
-            self._properties[newkey] = b
+            self._properties[newkey] = data.get(value)
 
     def get_class_name(self):
         return type(self).__name__
 
+    def parse_tree(self):
+        '''parses self and all its descendants, depth first. Uses a stack
+           instead of recursion: no limit on the depth
+        '''
+        self.parse_properties()
+        stack = [(self, iter(self.get_child_indexes()))]
+        while stack:
+            node, child_indexes = stack[-1]
+            for child_idx in child_indexes:
+                child = node.parse_child(child_idx)
+                if child is not None:
+                    stack.append((child, iter(child.get_child_indexes())))
+                    break
+            else:
+                # all its descendants were parsed
+                stack.pop()
+                node.compact()
+
     def parse_properties(self):
-        for child_idx in self._node_data["_children"]:
-            self.parse_child(child_idx['__id__'])
+        '''properties of the node. Its children are parsed by parse_tree()'''
+
+    def get_child_indexes(self):
+        '''indexes in json_data of the children to parse'''
+        return [child_idx['__id__'] for child_idx in self._node_data["_children"]]
 
     def parse_child(self, node_idx):
-        node = g_json_data[node_idx]
+        '''creates the child at node_idx. Returns it, or None if the node
+           is not supported. Its own children are not parsed
+        '''
+        node = g_ctx.json_data[node_idx]
         if node['__type__'] == 'cc.Node':
-            components = Node.get_node_components(node)
-            node_type = Node.guess_type_from_components(components)
+            node_type = Node.get_node_type(node_idx)
             if node_type is not None:
                 n = Node.create_node(node_type, node_idx)
                 self.adjust_child_parameters(n)
                 if n is not None:
                     self.add_child(n)
+                    return n
+        g_ctx.dropped_nodes.append({'name': node.get('_name', ''),
+                                    'type': node['__type__'],
+                                    'components': sorted(Node.get_node_components(node_idx)),
+                                    'descendants': count_json_descendants(node)})
+        return None
 
     def add_child(self, node):
         self._children.append(node)
 
+    def compact(self):
+        '''called once the node is parsed: switches to the compact
+           containers. The children are a tuple (the same empty one for
+           all the leaves), and _properties a Properties
+        '''
+        self._properties = Properties(self._properties)
+        self._children = tuple(self._children)
+
     def print_scene_graph(self, tab):
-        print(self.get_description(tab))
-        for child in self._children:
-            child.print_scene_graph(tab+2)
+        def visit(node, parent, depth, sibling_idx):
+            print(node.get_description(tab + depth * 2))
+            return node
+        walk_tree(self, visit)
 
     def get_description(self, tab):
         return "%s%s" % ('-' * tab, self.get_class_name())
 
+    def get_sprite_frame_uuids(self):
+        '''uuids of the sprite frames used by this node'''
+        return []
+
+    def is_emitted(self):
+        '''False if the node and its children are not part of the
+           cocos2d-x scene graph
+        '''
+        return True
+
+    def is_virtualized(self):
+        '''True if the children are created by item factories instead of
+           with the node (see ScrollView)
+        '''
+        return False
+
+    def collect_sprite_frames(self, used):
+        '''adds to `used` the sprite frames used by the emitted nodes'''
+        def visit(node, parent, depth, sibling_idx):
+            if node.is_emitted():
+                used.update(node.get_sprite_frame_uuids())
+                return node
+        walk_tree(self, visit)
+
+    def get_resource_files(self):
+        '''files (fonts, .tmx, .plist) loaded by this node, relative to g_ctx.path'''
+        return []
+
+    def get_draw_key(self):
+        '''what the node draws, for estimate_draw_calls(): None if nothing,
+           its texture if the renderer can batch it with the quads of the same
+           texture, or the node itself if it is drawn on its own
+        '''
+        return None
+
+    def clips_children(self):
+        '''True if the children are drawn in a clipping region, which stops
+           the batching before and after them
+        '''
+        return False
+
+    def collect_resource_files(self, used):
+        '''adds to `used` the files loaded by the emitted nodes'''
+        def visit(node, parent, depth, sibling_idx):
+            if node.is_emitted():
+                used.update(node.get_resource_files())
+                return node
+        walk_tree(self, visit)
+
+    def get_glyphs(self):
+        '''(font atlas, text) of the text drawn with a font atlas. The font
+           atlas is a (font type, font file, font size) tuple. None if no text
+        '''
+        return None
+
+    def collect_glyphs(self, glyphs):
+        '''adds to `glyphs` the characters drawn by the emitted nodes:
+           {font atlas: set of characters}
+        '''
+        def visit(node, parent, depth, sibling_idx):
+            if node.is_emitted():
+                font_glyphs = node.get_glyphs()
+                if font_glyphs is not None:
+                    font_atlas, text = font_glyphs
+                    glyphs.setdefault(font_atlas, set()).update(text)
+                return node
+        walk_tree(self, visit)
+
     def to_cpp(self, parent, depth, sibling_idx):
+        '''emits self and its descendants'''
+        chunk_nodes = g_ctx.options.get('time_sliced')
+        def visit(node, parent, depth, sibling_idx):
+            if node.is_emitted():
+                if chunk_nodes and g_ctx.unique_id > g_ctx.chunk_first_id and g_ctx.unique_id % chunk_nodes == 0:
+                    to_cpp_next_chunk()
+                node.to_cpp_node(parent, depth, sibling_idx)
+                if not node.is_virtualized():
+                    return node
+        walk_tree(self, visit, parent, depth, sibling_idx)
+
+    def to_cpp_node(self, parent, depth, sibling_idx):
         self.to_cpp_begin(depth, sibling_idx)
         self.to_cpp_properties()
         self.to_cpp_end()
         if parent is not None:
             parent.to_cpp_add_child(self)
 
-        for idx, child in enumerate(self._children):
-            child.to_cpp(self, depth+1, idx)
+        # no longer needed once the node was emitted
+        if g_ctx.options.get('low_memory'):
+            self._node_data = None
 
     def to_cpp_begin(self, depth, sibling_idx):
-        global g_unique_id
-        g_file_cpp.write("    // New node\n")
-        self._cpp_node_name = "%s_%d" % (self.get_class_name().lower(), g_unique_id)
+        g_ctx.cpp.write("    // New node\n")
+        self._cpp_node_name = "%s_%d" % (self.get_class_name().lower(), g_ctx.unique_id)
         self._cpp_node_name = self._cpp_node_name.replace(':','')
-        g_unique_id = g_unique_id + 1
-        g_file_cpp.write("    auto %s = %s::%s;\n" % (self._cpp_node_name, self.get_class_name(), self.to_cpp_create_params()))
+        self._cpp_node_id = g_ctx.unique_id
+        g_ctx.unique_id = g_ctx.unique_id + 1
+        g_ctx.cpp.write("    auto %s = %s::%s;\n" % (self._cpp_node_name, self.get_class_name(), self.to_cpp_create_params()))
+        if g_ctx.options.get('time_sliced'):
+            g_ctx.cpp.write("    nodes[%d] = %s;\n" % (self._cpp_node_id, self._cpp_node_name))
+
+    def get_cpp_reference(self):
+        '''C++ expression of the node in the code being emitted: its variable,
+           or its entry in `nodes` if a previous chunk created it (--time-sliced)
+        '''
+        if self._cpp_node_id < g_ctx.chunk_first_id:
+            return "static_cast<%s*>(nodes[%d])" % (self.get_class_name(), self._cpp_node_id)
+        return self._cpp_node_name
+
+    def get_non_default_properties(self):
+        '''(setter, value) of the properties that are not in CPP_DEFAULTS'''
+        properties = []
+        for p, value in self._properties.items():
+            if p in self.CPP_DEFAULTS and self.CPP_DEFAULTS[p] == value:
+                g_ctx.elided_properties += 1
+            else:
+                properties.append((p, value))
+        g_ctx.emitted_properties += len(properties)
+        return properties
 
     def to_cpp_properties(self):
-        for p in self._properties:
-            value = self._properties[p]
-            g_file_cpp.write("    %s->%s(%s);\n" % (self._cpp_node_name, p, value))
+        factory = g_ctx.item_factory
+        for p, value in self.get_non_default_properties():
+            if factory is not None:
+                if self is factory['item'] and p in factory['exclude']:
+                    continue
+                # set for each item by creator_virtualize_scrollview()
+                if p == 'setName':
+                    factory['names'].append(value.value)
+                    g_ctx.cpp.write("    bound->named.pushBack(%s);\n" % self._cpp_node_name)
+                    continue
+            g_ctx.cpp.write("    %s->%s(%s);\n" % (self._cpp_node_name, p, to_cpp_value(value)))
 
     def to_cpp_end(self):
         '''epilogue'''
 
     def to_cpp_add_child(self, child):
         '''adds a child to self'''
-        g_file_cpp.write("    %s->addChild(%s);\n" % (self._cpp_node_name, child._cpp_node_name))
-        g_file_cpp.write("")
+        g_ctx.cpp.write("    %s->addChild(%s);\n" % (self.get_cpp_reference(), child._cpp_node_name))
 
     def to_cpp_create_params(self):
         return "create()"
@@ -295,6 +844,23 @@ class Node(object):
            As an example, ScrollView needs to adjust its children position
         '''
 
+    def to_binary(self, writer, parent_idx):
+        '''same as to_cpp(), for the --binary backend'''
+        def visit(node, parent_idx, depth, sibling_idx):
+            if node.is_emitted():
+                return writer.add_node(node, parent_idx)
+        walk_tree(self, visit, parent_idx)
+
+    def get_binary_create_args(self):
+        '''binary version of to_cpp_create_params():
+           (subkind, strings, numbers) passed to the loader
+        '''
+        return (0, (), ())
+
+    def get_binary_end_properties(self):
+        '''binary version of to_cpp_end(): calls made after the properties'''
+        return []
+
 
 ################################################################################
 #
@@ -302,27 +868,33 @@ class Node(object):
 #
 ################################################################################
 class Scene(Node):
-    def __init__(self, data):
-        super(Scene, self).__init__(data)
+    # Scene::init() centers the anchor point
+    CPP_DEFAULTS = dict(Node.CPP_DEFAULTS, setAnchorPoint=Vec2(0.5, 0.5))
+
+    __slots__ = ()
+
+    def __init__(self, node_idx):
+        super(Scene, self).__init__(node_idx)
 
 
 class Canvas(Node):
-    def __init__(self, data):
-        super(Canvas, self).__init__(data)
+    __slots__ = ()
 
-        component = Node.get_node_component_of_type(self._node_data, 'cc.Canvas')
+    def __init__(self, node_idx):
+        super(Canvas, self).__init__(node_idx)
 
-        global g_design_resolution, g_fit_height, g_fit_width
-        g_design_resolution = component['_designResolution']
-        g_fit_width = component['_fitWidth']
-        g_fit_height = component['_fitHeight']
+        component = Node.get_node_component_of_type(self._node_idx, 'cc.Canvas')
+
+        g_ctx.design_resolution = component['_designResolution']
+        g_ctx.fit_width = component['_fitWidth']
+        g_ctx.fit_height = component['_fitHeight']
 
 
     # Canvas should be part of the big init
     # but as as part of the scene graph
     # since cocos2d-x doesn't have this concept
-    def to_cpp(self, parent, depth, sibling_idx):
-        pass
+    def is_emitted(self):
+        return False
 
 ################################################################################
 #
@@ -332,35 +904,53 @@ class Canvas(Node):
 ################################################################################
 class Sprite(Node):
     SIMPLE, SLICED, TILED, FILLED = range(4)
-    def __init__(self, data):
-        super(Sprite, self).__init__(data)
+
+    # opacityModifyRGB depends on the texture
+    CPP_DEFAULTS = dict((k, v) for k, v in Node.CPP_DEFAULTS.items() if k != 'setOpacityModifyRGB')
+    CPP_DEFAULTS['setAnchorPoint'] = Vec2(0.5, 0.5)
+
+    __slots__ = ('_sprite_type', '_sprite_frame_uuid')
+
+    def __init__(self, node_idx):
+        super(Sprite, self).__init__(node_idx)
         self._sprite_type = Sprite.SIMPLE
 
     def parse_properties(self):
         super(Sprite, self).parse_properties()
 
         # search for sprite frame name
-        component = Node.get_node_component_of_type(self._node_data, 'cc.Sprite')
+        component = Node.get_node_component_of_type(self._node_idx, 'cc.Sprite')
         sprite_frame_uuid = component['_spriteFrame']['__uuid__']
+        self._sprite_frame_uuid = sprite_frame_uuid
 
 #        atlas = component['_atlas']
 
         # add name between ""
-        print(g_sprite_frames[sprite_frame_uuid])
-        self.add_property_str('setSpriteFrame', 'frameName', g_sprite_frames[sprite_frame_uuid])
-        print(g_sprite_frames[sprite_frame_uuid])
+        logger.debug("%s", g_ctx.sprite_frames[sprite_frame_uuid])
+        self.add_property_str('setSpriteFrame', 'frameName', g_ctx.sprite_frames[sprite_frame_uuid])
 
         self._sprite_type = component['_type']
         if self._sprite_type == Sprite.SIMPLE:
-            self._properties['setCenterRectNormalized'] = 'Rect(0,0,1,1)'
+            self._properties['setCenterRectNormalized'] = Rect(0, 0, 1, 1)
 
     def get_description(self, tab):
         return "%s%s('%s')" % ('-' * tab, self.get_class_name(), self._properties['setSpriteFrame'])
 
+    def get_sprite_frame_uuids(self):
+        return [self._sprite_frame_uuid]
+
+    def get_draw_key(self):
+        return get_sprite_frame_texture(self._sprite_frame_uuid) or self
+
     def to_cpp_end(self):
         super(Sprite, self).to_cpp_end()
         if self._sprite_type == Sprite.TILED:
-            g_file_cpp.write("    creator_tile_sprite(%s);\n" % self._cpp_node_name)
+            g_ctx.cpp.write("    creator_tile_sprite(%s);\n" % self._cpp_node_name)
+
+    def get_binary_end_properties(self):
+        if self._sprite_type == Sprite.TILED:
+            return [('creator_tile_sprite', None)]
+        return []
 
 
 class Label(Node):
@@ -369,8 +959,14 @@ class Label(Node):
     H_ALIGNMENTS = ('TextHAlignment::LEFT', 'TextHAlignment::CENTER', 'TextHAlignment::RIGHT')
     V_ALIGNMENTS = ('TextVAlignment::TOP', 'TextVAlignment::CENTER', 'TextVAlignment::BOTTOM')
 
-    def __init__(self, data):
-        super(Label, self).__init__(data)
+    # the cascade and opacityModifyRGB flags depend on the font type
+    CPP_DEFAULTS = dict((k, v) for k, v in Node.CPP_DEFAULTS.items() if k not in ('setCascadeOpacityEnabled', 'setOpacityModifyRGB'))
+    CPP_DEFAULTS['setAnchorPoint'] = Vec2(0.5, 0.5)
+
+    __slots__ = ('_label_text', '_font_type', '_font_filename', '_font_size')
+
+    def __init__(self, node_idx):
+        super(Label, self).__init__(node_idx)
         self._label_text = ""
         self._font_type = Label.FONT_SYSTEM
         self._font_filename = None
@@ -379,7 +975,7 @@ class Label(Node):
         super(Label, self).parse_properties()
 
         # search for sprite frame name
-        component = Node.get_node_component_of_type(self._node_data, 'cc.Label')
+        component = Node.get_node_component_of_type(self._node_idx, 'cc.Label')
 
         is_system_font = component["_isSystemFontUsed"]
         self._font_size = component['_fontSize']
@@ -389,8 +985,8 @@ class Label(Node):
         self._label_text = self._label_text.replace('\n','\\n')
 
         # alignments
-        self._properties['setHorizontalAlignment'] = Label.H_ALIGNMENTS[component['_N$horizontalAlign']]
-        self._properties['setVerticalAlignment'] = Label.V_ALIGNMENTS[component['_N$verticalAlign']]
+        self._properties['setHorizontalAlignment'] = Enum(Label.H_ALIGNMENTS, component['_N$horizontalAlign'])
+        self._properties['setVerticalAlignment'] = Enum(Label.V_ALIGNMENTS, component['_N$verticalAlign'])
 
         if is_system_font:
             self._font_type = Label.FONT_SYSTEM
@@ -408,44 +1004,94 @@ class Label(Node):
             self.add_property_int('setLineHeight' ,'_lineHeight', component)
 
     def to_cpp_create_params(self):
+        text = self._label_text
+        # set for each item by creator_virtualize_scrollview()
+        if g_ctx.item_factory is not None:
+            text = ""
         if self._font_type == Label.FONT_SYSTEM:
-            return 'createWithSystemFont("' + self._label_text + '", "arial", ' + str(self._font_size) + ')'
+            return 'createWithSystemFont("' + text + '", "arial", ' + str(self._font_size) + ')'
         elif self._font_type == Label.FONT_BM:
-            return 'createWithBMFont("' + g_assetpath + self._font_filename + '", "' + self._label_text + '")'
+            return 'createWithBMFont("' + g_ctx.assetpath + self._font_filename + '", "' + text + '")'
         elif self._font_type == Label.FONT_TTF:
-            return 'createWithTTF("' + self._label_text + '", "'+ g_assetpath + self._font_filename + '", ' + str(self._font_size) + ')'
+            return 'createWithTTF("' + text + '", "'+ g_ctx.assetpath + self._font_filename + '", ' + str(self._font_size) + ')'
+
+    def to_cpp_end(self):
+        super(Label, self).to_cpp_end()
+        if g_ctx.item_factory is not None:
+            g_ctx.item_factory['strings'].append(self._label_text.replace('\\n', '\n'))
+            g_ctx.cpp.write("    bound->labels.pushBack(%s);\n" % self._cpp_node_name)
 
     def get_description(self, tab):
         return "%s%s('%s')" % ('-' * tab, self.get_class_name(), self._label_text)
 
+    def get_resource_files(self):
+        if self._font_type == Label.FONT_SYSTEM:
+            return []
+        return [self._font_filename]
+
+    def get_draw_key(self):
+        return self
+
+    def get_glyphs(self):
+        # system fonts are rendered to a texture by each label
+        if self._font_type == Label.FONT_SYSTEM:
+            return None
+        text = self._label_text.replace('\\n', '')
+        # a BMFont atlas has all its glyphs, at any size
+        if self._font_type == Label.FONT_BM:
+            return ((self._font_type, self._font_filename, None), text)
+        return ((self._font_type, self._font_filename, self._font_size), text)
+
+    def get_binary_create_args(self):
+        text = self._label_text.replace('\\n', '\n')
+        if self._font_type == Label.FONT_SYSTEM:
+            return (self._font_type, (text,), (self._font_size,))
+        return (self._font_type, (text, g_ctx.assetpath + self._font_filename), (self._font_size,))
+
 
 class ParticleSystem(Node):
-    def __init__(self, data):
-        super(ParticleSystem, self).__init__(data)
+    # the .plist sets the anchor point and opacityModifyRGB
+    CPP_DEFAULTS = dict((k, v) for k, v in Node.CPP_DEFAULTS.items() if k not in ('setAnchorPoint', 'setOpacityModifyRGB'))
 
-        component = Node.get_node_component_of_type(self._node_data, 'cc.ParticleSystem')
+    # the particles go anywhere
+    BOUNDED = False
 
-        self._particle_system_file = Node.get_filepath_from_uuid(component['_file']['__uuid__'])
+    __slots__ = ('_particle_system_file',)
+
+    def __init__(self, node_idx):
+        super(ParticleSystem, self).__init__(node_idx)
+
+        component = Node.get_node_component_of_type(self._node_idx, 'cc.ParticleSystem')
 
-        # tag it as needed resourse
-        g_resources_needed.add(self._particle_system_file)
+        self._particle_system_file = Node.get_filepath_from_uuid(component['_file']['__uuid__'])
 
     def get_class_name(self):
         return 'ParticleSystemQuad'
 
+    def get_resource_files(self):
+        return [self._particle_system_file]
+
+    def get_draw_key(self):
+        return self
+
     def to_cpp_create_params(self):
-        return 'create("' + g_assetpath + self._particle_system_file + '")'
+        return 'create("' + g_ctx.assetpath + self._particle_system_file + '")'
+
+    def get_binary_create_args(self):
+        return (0, (g_ctx.assetpath + self._particle_system_file,), ())
 
 
 class TiledMap(Node):
-    def __init__(self, data):
-        super(TiledMap, self).__init__(data)
+    # its content size is not set
+    BOUNDED = False
 
-        component = Node.get_node_component_of_type(self._node_data, 'cc.TiledMap')
-        self._tmx_file = Node.get_filepath_from_uuid(component['_tmxFile']['__uuid__'])
+    __slots__ = ('_tmx_file',)
 
-        # tag it as needed resourse
-        g_resources_needed.add(self._tmx_file)
+    def __init__(self, node_idx):
+        super(TiledMap, self).__init__(node_idx)
+
+        component = Node.get_node_component_of_type(self._node_idx, 'cc.TiledMap')
+        self._tmx_file = Node.get_filepath_from_uuid(component['_tmxFile']['__uuid__'])
 
         # for some reason, changing the contentSize breaks the TMX
         del self._properties['setContentSize']
@@ -453,8 +1099,17 @@ class TiledMap(Node):
     def get_class_name(self):
         return 'TMXTiledMap'
 
+    def get_resource_files(self):
+        return [self._tmx_file]
+
+    def get_draw_key(self):
+        return self
+
     def to_cpp_create_params(self):
-        return 'create("' + g_assetpath + self._tmx_file + '")'
+        return 'create("' + g_ctx.assetpath + self._tmx_file + '")'
+
+    def get_binary_create_args(self):
+        return (0, (g_ctx.assetpath + self._tmx_file,), ())
 
 
 ################################################################################
@@ -484,29 +1139,42 @@ class Button(Node):
     # "hoverSprite": { "__uuid__":
     TRANSITION_NONE, TRANSITION_COLOR, TRANSITION_SPRITE = range(3)
 
-    def __init__(self, data):
-        super(Button, self).__init__(data)
+    CPP_DEFAULTS = Node.WIDGET_CPP_DEFAULTS
+
+    __slots__ = ('_normalSprite', '_normalSpriteUuid')
+
+    def __init__(self, node_idx):
+        super(Button, self).__init__(node_idx)
 
     def parse_properties(self):
         super(Button, self).parse_properties()
 
         # search for sprite frame name
-        spr_component = Node.get_node_component_of_type(self._node_data, 'cc.Sprite')
-        but_component = Node.get_node_component_of_type(self._node_data, 'cc.Button')
+        spr_component = Node.get_node_component_of_type(self._node_idx, 'cc.Sprite')
+        but_component = Node.get_node_component_of_type(self._node_idx, 'cc.Button')
 
-        self._normalSprite = Node.get_filepath_from_uuid(but_component['_N$normalSprite']['__uuid__'])
-        self._properties['ignoreContentAdaptWithSize'] = 'false'
+        self._normalSpriteUuid = but_component['_N$normalSprite']['__uuid__']
+        self._normalSprite = Node.get_filepath_from_uuid(self._normalSpriteUuid)
+        self._properties['ignoreContentAdaptWithSize'] = False
 
     def get_class_name(self):
         return 'ui::Button'
 
+    def get_sprite_frame_uuids(self):
+        return [self._normalSpriteUuid]
+
+    def get_draw_key(self):
+        return get_sprite_frame_texture(self._normalSpriteUuid) or self
+
     def to_cpp_create_params(self):
         return 'create("%s", "", "", ui::Widget::TextureResType::PLIST)' % self._normalSprite
 
+    def get_binary_create_args(self):
+        return (0, (self._normalSprite,), ())
+
     def to_cpp_add_child(self, child):
         # replaces addChild() with setTitleLabel()
-        g_file_cpp.write("    %s->setTitleLabel(%s);\n" % (self._cpp_node_name, child._cpp_node_name))
-        g_file_cpp.write("")
+        g_ctx.cpp.write("    %s->setTitleLabel(%s);\n" % (self.get_cpp_reference(), child._cpp_node_name))
 
 
 class EditBox(Node):
@@ -549,18 +1217,24 @@ class EditBox(Node):
             'ui::EditBox::KeyboardReturnType::GO',
             )
 
-    def __init__(self, data):
-        super(EditBox, self).__init__(data)
+    # EditBox::initWithSizeAndBackgroundSprite() sets its own anchor point
+    CPP_DEFAULTS = dict((k, v) for k, v in Node.WIDGET_CPP_DEFAULTS.items() if k != 'setAnchorPoint')
+
+    __slots__ = ('_backgroundImage', '_backgroundImageUuid')
+
+    def __init__(self, node_idx):
+        super(EditBox, self).__init__(node_idx)
 
     def parse_properties(self):
         super(EditBox, self).parse_properties()
 
         # search for sprite frame name
-        component = Node.get_node_component_of_type(self._node_data, 'cc.EditBox')
-        self._backgroundImage = Node.get_filepath_from_uuid(component['_N$backgroundImage']['__uuid__'])
-        self._properties['setReturnType'] = EditBox.RETURN_TYPE[component['_N$returnType']]
-        self._properties['setInputFlag'] = EditBox.INPUT_FLAG[component['_N$inputFlag']]
-        self._properties['setInputMode'] = EditBox.INPUT_MODE[component['_N$inputMode']]
+        component = Node.get_node_component_of_type(self._node_idx, 'cc.EditBox')
+        self._backgroundImageUuid = component['_N$backgroundImage']['__uuid__']
+        self._backgroundImage = Node.get_filepath_from_uuid(self._backgroundImageUuid)
+        self._properties['setReturnType'] = Enum(EditBox.RETURN_TYPE, component['_N$returnType'])
+        self._properties['setInputFlag'] = Enum(EditBox.INPUT_FLAG, component['_N$inputFlag'])
+        self._properties['setInputMode'] = Enum(EditBox.INPUT_MODE, component['_N$inputMode'])
         self.add_property_int('setFontSize', '_N$fontSize', component)
 #        self.add_property_int('setLineHeight', '_N$lineHeight', component)
         self.add_property_rgb('setFontColor', '_N$fontColor', component)
@@ -573,12 +1247,22 @@ class EditBox(Node):
     def get_class_name(self):
         return 'ui::EditBox'
 
+    def get_sprite_frame_uuids(self):
+        return [self._backgroundImageUuid]
+
+    def get_draw_key(self):
+        return self
+
     def to_cpp_create_params(self):
         s = self._node_data['_contentSize']
         w = s['width']
         h = s['height']
         return 'create(Size(%d,%d), "%s", ui::Widget::TextureResType::PLIST)' % (w, h, self._backgroundImage)
 
+    def get_binary_create_args(self):
+        s = self._node_data['_contentSize']
+        return (0, (self._backgroundImage,), (int(s['width']), int(s['height'])))
+
 
 class ProgressBar(Node):
     # custom properties
@@ -588,17 +1272,24 @@ class ProgressBar(Node):
     # "_N$progress": 0.5,
     # "_N$reverse": false
 
+    __slots__ = ()
+
+    CPP_DEFAULTS = Node.WIDGET_CPP_DEFAULTS
+
     def parse_properties(self):
         super(ProgressBar, self).parse_properties()
 
         # search for sprite frame name
-        component = Node.get_node_component_of_type(self._node_data, 'cc.ProgressBar')
+        component = Node.get_node_component_of_type(self._node_idx, 'cc.ProgressBar')
         self._properties['setPercent'] = component['_N$progress'] * 100
 
 
     def get_class_name(self):
         return 'ui::LoadingBar'
 
+    def get_draw_key(self):
+        return self
+
     def to_cpp_create_params(self):
         return 'create()'
 
@@ -619,6 +1310,18 @@ class ScrollView(Node):
     # for the sprites used internally
     SIMPLE, SLICED, TILED, FILLED = range(4)
 
+    # same order as the cocos2d-x enum
+    NONE, VERTICAL, HORIZONTAL, BOTH = range(4)
+    DIRECTION = ('ui::ScrollView::Direction::NONE',
+            'ui::ScrollView::Direction::VERTICAL',
+            'ui::ScrollView::Direction::HORIZONTAL',
+            'ui::ScrollView::Direction::BOTH')
+
+    # ui::Layout::init() resets the anchor point to (0, 0)
+    CPP_DEFAULTS = dict(Node.WIDGET_CPP_DEFAULTS, setAnchorPoint=Vec2(0, 0))
+
+    __slots__ = ('_background_uuid', '_content_size', '_content_ap', '_content_pos', '_virtual_list')
+
     def get_content_node(self):
         # Node
         #  +--> ScrollBar
@@ -631,7 +1334,7 @@ class ScrollView(Node):
         # find the "view" node
         for child_idx in self._node_data["_children"]:
             node_idx = child_idx['__id__']
-            node = g_json_data[node_idx]
+            node = g_ctx.json_data[node_idx]
 
             if node["_name"] == "view":
                 view_node = node
@@ -640,7 +1343,7 @@ class ScrollView(Node):
         if view_node is not None:
             for child_idx in view_node["_children"]:
                 node_idx = child_idx['__id__']
-                node = g_json_data[node_idx]
+                node = g_ctx.json_data[node_idx]
 
                 if node["_name"] == "content":
                     content_node = node
@@ -651,34 +1354,34 @@ class ScrollView(Node):
             raise Exception("ContentNode not found")
 
     def parse_properties(self):
-        # Don't call super since it will parse all its children
-        # We only care about the "content" child
-        # super(ScrollView, self).parse_properties()
+        # Its children are the ones of the "content" node: see get_child_indexes()
+        super(ScrollView, self).parse_properties()
 
         # data from 'node' component
         self.add_property_rgb('setBackGroundImageColor', '_color', self._node_data)
 
         # data from sprite component
-        component_spr = Node.get_node_component_of_type(self._node_data, 'cc.Sprite')
+        component_spr = Node.get_node_component_of_type(self._node_idx, 'cc.Sprite')
         sprite_frame_uuid = component_spr['_spriteFrame']['__uuid__']
-        self._properties['setBackGroundImage'] =  '"%s", ui::Widget::TextureResType::PLIST' % g_sprite_frames[sprite_frame_uuid]['frameName']
+        self._background_uuid = sprite_frame_uuid
+        self._properties['setBackGroundImage'] = PlistFrame(g_ctx.sprite_frames[sprite_frame_uuid]['frameName'])
 
         # Sliced ?
         if component_spr['_type'] == ScrollView.SLICED:
-            self._properties['setBackGroundImageScale9Enabled'] = "true"
+            self._properties['setBackGroundImageScale9Enabled'] = True
         else:
-            self._properties['setBackGroundImageScale9Enabled'] = "false"
+            self._properties['setBackGroundImageScale9Enabled'] = False
 
         # data from scroll view component
-        component_sv = Node.get_node_component_of_type(self._node_data, 'cc.ScrollView')
+        component_sv = Node.get_node_component_of_type(self._node_idx, 'cc.ScrollView')
         if component_sv['horizontal'] and component_sv['vertical']:
-            self._properties['setDirection'] = 'ui::ScrollView::Direction::BOTH'
+            self._properties['setDirection'] = Enum(ScrollView.DIRECTION, ScrollView.BOTH)
         elif component_sv['horizontal']:
-            self._properties['setDirection'] = 'ui::ScrollView::Direction::HORIZONTAL'
+            self._properties['setDirection'] = Enum(ScrollView.DIRECTION, ScrollView.HORIZONTAL)
         elif component_sv['vertical']:
-            self._properties['setDirection'] = 'ui::ScrollView::Direction::VERTICAL'
+            self._properties['setDirection'] = Enum(ScrollView.DIRECTION, ScrollView.VERTICAL)
         else:
-            self._properties['setDirection'] = 'ui::ScrollView::Direction::NONE'
+            self._properties['setDirection'] = Enum(ScrollView.DIRECTION, ScrollView.NONE)
         self.add_property_bool('setBounceEnabled', 'elastic', component_sv)
 
         # content node
@@ -698,13 +1401,23 @@ class ScrollView(Node):
         self._content_pos = content_node['_position']
         #self._properties['getInnerContainer()->setPosition'] = 'Vec2(%g,%g)' % (self._content_pos['x'], self._content_pos['y'])
 
-        # add its children
-        for child_idx in content_node["_children"]:
-            self.parse_child(child_idx['__id__'])
+        # its children (the ones of content) are parsed by parse_tree()
+
+    def get_child_indexes(self):
+        return [child_idx['__id__'] for child_idx in self.get_content_node()["_children"]]
 
     def get_class_name(self):
         return 'ui::ScrollView'
 
+    def get_sprite_frame_uuids(self):
+        return [self._background_uuid]
+
+    def get_draw_key(self):
+        return self
+
+    def clips_children(self):
+        return True
+
     def to_cpp_create_params(self):
         return 'create()'
 
@@ -715,22 +1428,525 @@ class ScrollView(Node):
         # FIXME: uses the anchorPoint for the percent in the bar, but 
         # this migh break if it changes the position of the bar
         # content node
-        g_file_cpp.write("    %s->jumpToPercentVertical(%g * 100);\n" % (self._cpp_node_name, (1-self._content_ap['y'])))
-        g_file_cpp.write("    %s->jumpToPercentHorizontal(%g * 100);\n" % (self._cpp_node_name, self._content_ap['x']))
+        g_ctx.cpp.write("    %s->jumpToPercentVertical(%g * 100);\n" % (self._cpp_node_name, (1-self._content_ap['y'])))
+        g_ctx.cpp.write("    %s->jumpToPercentHorizontal(%g * 100);\n" % (self._cpp_node_name, self._content_ap['x']))
+        if self.is_virtualized():
+            g_ctx.cpp.write("    creator_virtualize_scrollview(%s, %s_items, %d, %s_factories, %d);\n" % (
+                self._cpp_node_name, self._virtual_list[0], len(self._children), self._virtual_list[0], self._virtual_list[1]))
+
+    def is_virtualized(self):
+        min_items = g_ctx.options.get('virtual_scrollviews')
+        return bool(min_items) and len(self._children) >= min_items
+
+    def to_cpp_virtual_list(self):
+        '''emits the factories and the layout of the items (the children).
+           Items that only differ by their position, the names of their nodes
+           and the strings of their labels share a factory: those are set
+           for each item, from the _names<n> and _strings<n> arrays
+        '''
+        prefix = "%s_list%d" % (g_ctx.filename, g_ctx.virtual_lists)
+        g_ctx.virtual_lists += 1
+
+        factories = {}
+        # {kind: {values: index}}, one array per distinct values
+        arrays = {'names': {}, 'strings': {}}
+        items = []
+        for child in self._children:
+            layout = get_item_layout(child)
+            # the position is set by creator_virtualize_scrollview()
+            code, names, strings = to_cpp_item_factory(child, ('setPosition',))
+            if code not in factories:
+                factories[code] = len(factories)
+                g_ctx.cpp.write("static Node* %s_item%d(CreatorListItemNodes* bound)\n{\n%s    return %s;\n}\n\n" % (
+                    prefix, factories[code], code, child._cpp_node_name))
+            values = []
+            for kind, values_of_kind in (('names', names), ('strings', strings)):
+                values_of_kind = tuple(values_of_kind)
+                if not values_of_kind:
+                    values.append('nullptr')
+                    continue
+                if values_of_kind not in arrays[kind]:
+                    arrays[kind][values_of_kind] = len(arrays[kind])
+                values.append("%s_%s%d" % (prefix, kind, arrays[kind][values_of_kind]))
+            items.append((factories[code],) + layout + tuple(values))
+
+        for kind in ('names', 'strings'):
+            for values_of_kind, i in sorted(arrays[kind].items(), key=lambda a: a[1]):
+                g_ctx.cpp.write("static const char* const %s_%s%d[] = {%s};\n" % (
+                    prefix, kind, i, ', '.join(to_cpp_string(v) for v in values_of_kind)))
+        if arrays['names'] or arrays['strings']:
+            g_ctx.cpp.write("\n")
+
+        g_ctx.cpp.write("static const CreatorListItem %s_items[] = {\n" % prefix)
+        for item in items:
+            # %.9g: no rounding of the float coordinates of long lists
+            g_ctx.cpp.write("    {%d, %.9g, %.9g, %.9g, %.9g, %.9g, %.9g, %s, %s},\n" % item)
+        g_ctx.cpp.write("};\n\nstatic const CreatorListItemFactory %s_factories[] = {\n" % prefix)
+        for i in range(len(factories)):
+            g_ctx.cpp.write("    %s_item%d,\n" % (prefix, i))
+        g_ctx.cpp.write("};\n\n")
+        self._virtual_list = (prefix, len(factories))
+
+    def get_binary_end_properties(self):
+        # same rounding as the %g used by to_cpp_end()
+        return [('jumpToPercentVertical', float('%g' % (1-self._content_ap['y'])) * 100),
+                ('jumpToPercentHorizontal', float('%g' % self._content_ap['x']) * 100)]
 
 
     def adjust_child_parameters(self, child):
         # FIXME: adjust child position since innerContainer doesn't honor
         # position and anchorPoit.
         pos = child._properties['setPosition']
-        g = re.match('Vec2\(([-+]?[0-9]*\.?[0-9]+), ([-+]?[0-9]*\.?[0-9]+)\)', pos)
-        if g is not None:
-            x = float(g.group(1))
-            y = float(g.group(2))
-            child._properties['setPosition'] = "Vec2(%g, %g)" % (x + self._content_size['width'] * self._content_ap['x'],
-                    y + self._content_size['height'] * self._content_ap['y'])
-        else:
-            raise Exception("Could not parse position: %s" % pos)
+        child._properties['setPosition'] = Vec2(pos.x + self._content_size['width'] * self._content_ap['x'],
+                pos.y + self._content_size['height'] * self._content_ap['y'])
+
+
+################################################################################
+#
+# Binary backend (--binary)
+# Serializes the parsed tree. creator_scene_loader.cpp builds it at runtime
+#
+################################################################################
+BINARY_FORMAT_VERSION = 1
+
+# node kinds, indexed by get_class_name()
+BINARY_KINDS = ('Node', 'Scene', 'Sprite', 'Label', 'ParticleSystemQuad',
+        'TMXTiledMap', 'ui::Button', 'ui::EditBox', 'ui::LoadingBar', 'ui::ScrollView')
+
+# keys of Node._properties, plus the calls made by to_cpp_end()
+BINARY_SETTERS = (
+        # Node
+        'setContentSize', 'setEnabled', 'setName', 'setAnchorPoint',
+        'setCascadeOpacityEnabled', 'setColor', 'setGlobalZOrder', 'setLocalZOrder',
+        'setOpacity', 'setOpacityModifyRGB', 'setPosition', 'setRotationSkewX',
+        'setRotationSkewY', 'setScaleX', 'setScaleY', 'setSkewX', 'setSkewY', 'setTag',
+        # Sprite
+        'setSpriteFrame', 'setCenterRectNormalized', 'creator_tile_sprite',
+        # Label
+        'setHorizontalAlignment', 'setVerticalAlignment', 'setBMFontSize', 'setLineHeight',
+        # Button
+        'ignoreContentAdaptWithSize',
+        # EditBox
+        'setReturnType', 'setInputFlag', 'setInputMode', 'setFontSize', 'setFontColor',
+        'setPlaceHolder', 'setPlaceholderFontSize', 'setPlaceholderFontColor',
+        'setMaxLength', 'setText',
+        # ProgressBar
+        'setPercent',
+        # ScrollView
+        'setBackGroundImageColor', 'setBackGroundImage', 'setBackGroundImageScale9Enabled',
+        'setDirection', 'setBounceEnabled', 'setInnerContainerSize',
+        'jumpToPercentVertical', 'jumpToPercentHorizontal')
+
+# types of the property values
+BINARY_TYPES = ('int', 'float', 'bool', 'vec2', 'size', 'color3b', 'rect', 'string', 'enum', 'none')
+T_INT, T_FLOAT, T_BOOL, T_VEC2, T_SIZE, T_COLOR3B, T_RECT, T_STRING, T_ENUM, T_NONE = range(len(BINARY_TYPES))
+
+BINARY_NO_STRING = 0xffffffff
+# magic, version, node count, property count, string count,
+# nodes offset, properties offset, strings offset
+BINARY_HEADER_FORMAT = '<4sIIIIIII'
+# kind, subkind, reserved, parent, first property, property count, str[2], num[2]
+BINARY_NODE_FORMAT = '<BBHiIIIIff'
+# setter, type, reserved + 16 bytes of value
+BINARY_PROPERTY_FORMAT = '<HBB'
+
+
+class BinarySceneWriter(object):
+    '''Collects the nodes, properties and strings of a scene.
+       Layout: header | node records | property records | string offsets | strings
+    '''
+    def __init__(self):
+        self._strings = {}
+        self._string_offsets = []
+        self._string_data = []
+        self._string_size = 0
+        self._nodes = []
+        self._properties = []
+
+    def add_string(self, s):
+        '''interns s. Returns its index in the string table'''
+        if s is None:
+            return BINARY_NO_STRING
+        idx = self._strings.get(s)
+        if idx is None:
+            data = s.encode('utf-8') if isinstance(s, unicode) else s
+            idx = len(self._string_offsets)
+            self._strings[s] = idx
+            self._string_offsets.append(self._string_size)
+            self._string_data.append(data + b'\0')
+            self._string_size += len(data) + 1
+        return idx
+
+    def pack_value(self, value):
+        '''(type, 16 bytes) of a property value'''
+        if value is None:
+            return T_NONE, struct.pack('<16x')
+        if isinstance(value, bool):
+            return T_BOOL, struct.pack('<i12x', value)
+        if isinstance(value, (int, long)):
+            return T_INT, struct.pack('<i12x', value)
+        if isinstance(value, float):
+            # to_cpp_value() prints it with str()
+            return T_FLOAT, struct.pack('<f12x', float(str(value)))
+        if isinstance(value, Enum):
+            return T_ENUM, struct.pack('<i12x', value.index)
+        if isinstance(value, String):
+            # PlistFrame's TextureResType is implied
+            return T_STRING, struct.pack('<I12x', self.add_string(value.value))
+        if isinstance(value, Vec2):
+            return T_VEC2, struct.pack('<ff8x', value.x, value.y)
+        if isinstance(value, Size):
+            return T_SIZE, struct.pack('<ff8x', value.width, value.height)
+        if isinstance(value, Rect):
+            return T_RECT, struct.pack('<ffff', value.x, value.y, value.width, value.height)
+        if isinstance(value, Color3B):
+            return T_COLOR3B, struct.pack('<iii4x', int(value.r), int(value.g), int(value.b))
+        raise Exception("Value not supported by the binary format: %r" % (value,))
+
+    def add_node(self, node, parent_idx):
+        '''adds node and its properties. Returns its index'''
+        kind = BINARY_KINDS.index(node.get_class_name())
+        subkind, strings, numbers = node.get_binary_create_args()
+        strings = [self.add_string(s) for s in strings] + [BINARY_NO_STRING] * (2 - len(strings))
+        numbers = list(numbers) + [0] * (2 - len(numbers))
+
+        properties = node.get_non_default_properties() + node.get_binary_end_properties()
+        first_property = len(self._properties)
+        for setter, value in properties:
+            t, data = self.pack_value(value)
+            self._properties.append(struct.pack(BINARY_PROPERTY_FORMAT, BINARY_SETTERS.index(setter), t, 0) + data)
+
+        self._nodes.append(struct.pack(BINARY_NODE_FORMAT, kind, subkind, 0, parent_idx,
+            first_property, len(properties), strings[0], strings[1], numbers[0], numbers[1]))
+        return len(self._nodes) - 1
+
+    def getvalue(self):
+        nodes_offset = struct.calcsize(BINARY_HEADER_FORMAT)
+        properties_offset = nodes_offset + sum(len(n) for n in self._nodes)
+        strings_offset = properties_offset + sum(len(p) for p in self._properties)
+        header = struct.pack(BINARY_HEADER_FORMAT, b'CSCN', BINARY_FORMAT_VERSION,
+                len(self._nodes), len(self._properties), len(self._string_offsets),
+                nodes_offset, properties_offset, strings_offset)
+        offsets = struct.pack('<%dI' % len(self._string_offsets), *self._string_offsets)
+        return b''.join([header] + self._nodes + self._properties + [offsets] + self._string_data)
+
+
+def to_binary_loader():
+    '''emitters of creator_scene_loader.h/.cpp, the runtime side of --binary'''
+    loader_h = Emitter('cpp/creator_scene_loader.h')
+    loader_h.write(BINARY_LOADER_H)
+
+    def enum(prefix, names):
+        return ', '.join(prefix + n.replace('::', '_') for n in names)
+
+    loader_cpp = Emitter('cpp/creator_scene_loader.cpp')
+    loader_cpp.write(BINARY_LOADER_CPP
+            .replace('@VERSION@', str(BINARY_FORMAT_VERSION))
+            .replace('@KINDS@', enum('K_', [k.upper() for k in BINARY_KINDS]))
+            .replace('@SETTERS@', enum('P_', BINARY_SETTERS))
+            .replace('@TYPES@', enum('T_', [t.upper() for t in BINARY_TYPES])))
+    return [loader_h, loader_cpp]
+
+
+BINARY_LOADER_H = """////// AUTOGENERATED:BEGIN //////
+////// DO     NOT     EDIT //////
+#pragma once
+
+#include <cocos2d.h>
+
+// builds a scene converted with --binary
+cocos2d::Node* creator_load_scene(const std::string& filename);
+
+////// AUTOGENERATED:END//////
+"""
+
+BINARY_LOADER_CPP = """////// AUTOGENERATED:BEGIN //////
+////// DO     NOT     EDIT //////
+
+// Loader of the scenes converted with --binary.
+// Builds the same node graph as the code generated by the default backend
+
+#include "creator_scene_loader.h"
+
+#include <ui/CocosGUI.h>
+#include "creator_utils.h"
+
+#if (CC_TARGET_PLATFORM != CC_PLATFORM_WIN32)
+#include <fcntl.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <unistd.h>
+#endif
+
+USING_NS_CC;
+
+namespace {
+
+// must match BINARY_FORMAT_VERSION, BINARY_KINDS, BINARY_SETTERS and BINARY_TYPES in parser.py
+const uint32_t FORMAT_VERSION = @VERSION@;
+enum Kind { @KINDS@ };
+enum Setter { @SETTERS@ };
+enum Type { @TYPES@ };
+const uint32_t NO_STRING = 0xffffffff;
+
+struct Header
+{
+    char magic[4];
+    uint32_t version;
+    uint32_t nodeCount;
+    uint32_t propertyCount;
+    uint32_t stringCount;
+    uint32_t nodesOffset;
+    uint32_t propertiesOffset;
+    uint32_t stringsOffset;
+};
+
+struct NodeRecord
+{
+    uint8_t kind;
+    uint8_t subkind;
+    uint16_t reserved;
+    int32_t parent;
+    uint32_t firstProperty;
+    uint32_t propertyCount;
+    uint32_t str[2];
+    float num[2];
+};
+
+struct PropertyRecord
+{
+    uint16_t setter;
+    uint8_t type;
+    uint8_t reserved;
+    union {
+        int32_t i[4];
+        float f[4];
+        uint32_t s[4];
+    };
+};
+
+// read-only view of the file: memory mapped when possible,
+// otherwise (files inside the .apk, Windows) read into memory
+class SceneFile
+{
+public:
+    explicit SceneFile(const std::string& filename)
+    : _bytes(nullptr)
+    , _size(0)
+    , _mapped(false)
+    {
+        auto fullpath = FileUtils::getInstance()->fullPathForFilename(filename);
+#if (CC_TARGET_PLATFORM != CC_PLATFORM_WIN32)
+        int fd = open(fullpath.c_str(), O_RDONLY);
+        if (fd >= 0)
+        {
+            struct stat st;
+            if (fstat(fd, &st) == 0 && st.st_size > 0)
+            {
+                void* p = mmap(nullptr, st.st_size, PROT_READ, MAP_PRIVATE, fd, 0);
+                if (p != MAP_FAILED)
+                {
+                    _bytes = static_cast<const uint8_t*>(p);
+                    _size = st.st_size;
+                    _mapped = true;
+                }
+            }
+            close(fd);
+        }
+#endif
+        if (!_mapped)
+        {
+            _data = FileUtils::getInstance()->getDataFromFile(fullpath);
+            _bytes = _data.getBytes();
+            _size = _data.getSize();
+        }
+    }
+
+    ~SceneFile()
+    {
+#if (CC_TARGET_PLATFORM != CC_PLATFORM_WIN32)
+        if (_mapped)
+            munmap(const_cast<uint8_t*>(_bytes), _size);
+#endif
+    }
+
+    const uint8_t* bytes() const { return _bytes; }
+    size_t size() const { return _size; }
+
+private:
+    const uint8_t* _bytes;
+    size_t _size;
+    bool _mapped;
+    Data _data;
+};
+
+class SceneBuilder
+{
+public:
+    explicit SceneBuilder(const uint8_t* bytes)
+    : _header(reinterpret_cast<const Header*>(bytes))
+    , _nodes(reinterpret_cast<const NodeRecord*>(bytes + _header->nodesOffset))
+    , _properties(reinterpret_cast<const PropertyRecord*>(bytes + _header->propertiesOffset))
+    , _stringOffsets(reinterpret_cast<const uint32_t*>(bytes + _header->stringsOffset))
+    , _stringData(reinterpret_cast<const char*>(_stringOffsets + _header->stringCount))
+    {
+    }
+
+    Node* build()
+    {
+        std::vector<Node*> nodes(_header->nodeCount);
+        for (uint32_t i = 0; i < _header->nodeCount; ++i)
+        {
+            const NodeRecord& record = _nodes[i];
+            auto node = createNode(record);
+            for (uint32_t p = 0; p < record.propertyCount; ++p)
+                applyProperty(node, _properties[record.firstProperty + p]);
+            if (record.parent >= 0)
+                addChild(nodes[record.parent], _nodes[record.parent].kind, node);
+            nodes[i] = node;
+        }
+        return _header->nodeCount > 0 ? nodes[0] : nullptr;
+    }
+
+private:
+    const char* string(uint32_t idx) const
+    {
+        return idx == NO_STRING ? "" : _stringData + _stringOffsets[idx];
+    }
+
+    static float number(const PropertyRecord& p)
+    {
+        return p.type == T_INT ? p.i[0] : p.f[0];
+    }
+
+    Node* createNode(const NodeRecord& r) const
+    {
+        switch (r.kind)
+        {
+        case K_SCENE:
+            return Scene::create();
+        case K_SPRITE:
+            return Sprite::create();
+        case K_LABEL:
+            // subkind: Label.FONT_SYSTEM, FONT_TTF, FONT_BM
+            if (r.subkind == 1)
+                return Label::createWithTTF(string(r.str[0]), string(r.str[1]), r.num[0]);
+            else if (r.subkind == 2)
+                return Label::createWithBMFont(string(r.str[1]), string(r.str[0]));
+            return Label::createWithSystemFont(string(r.str[0]), "arial", r.num[0]);
+        case K_PARTICLESYSTEMQUAD:
+            return ParticleSystemQuad::create(string(r.str[0]));
+        case K_TMXTILEDMAP:
+            return TMXTiledMap::create(string(r.str[0]));
+        case K_UI_BUTTON:
+            return ui::Button::create(string(r.str[0]), "", "", ui::Widget::TextureResType::PLIST);
+        case K_UI_EDITBOX:
+            return ui::EditBox::create(Size(r.num[0], r.num[1]), string(r.str[0]), ui::Widget::TextureResType::PLIST);
+        case K_UI_LOADINGBAR:
+            return ui::LoadingBar::create();
+        case K_UI_SCROLLVIEW:
+            return ui::ScrollView::create();
+        default:
+            return Node::create();
+        }
+    }
+
+    void applyProperty(Node* node, const PropertyRecord& p) const
+    {
+        switch (p.setter)
+        {
+        // Node
+        case P_setContentSize: node->setContentSize(Size(p.f[0], p.f[1])); break;
+        case P_setEnabled:
+            if (auto widget = dynamic_cast<ui::Widget*>(node))
+                widget->setEnabled(p.i[0] != 0);
+            break;
+        case P_setName: node->setName(string(p.s[0])); break;
+        case P_setAnchorPoint: node->setAnchorPoint(Vec2(p.f[0], p.f[1])); break;
+        case P_setCascadeOpacityEnabled: node->setCascadeOpacityEnabled(p.i[0] != 0); break;
+        case P_setColor: node->setColor(Color3B(p.i[0], p.i[1], p.i[2])); break;
+        case P_setGlobalZOrder: node->setGlobalZOrder(number(p)); break;
+        case P_setLocalZOrder: node->setLocalZOrder(number(p)); break;
+        case P_setOpacity: node->setOpacity(number(p)); break;
+        case P_setOpacityModifyRGB: node->setOpacityModifyRGB(p.i[0] != 0); break;
+        case P_setPosition: node->setPosition(Vec2(p.f[0], p.f[1])); break;
+        case P_setRotationSkewX: node->setRotationSkewX(number(p)); break;
+        case P_setRotationSkewY: node->setRotationSkewY(number(p)); break;
+        case P_setScaleX: node->setScaleX(number(p)); break;
+        case P_setScaleY: node->setScaleY(number(p)); break;
+        case P_setSkewX: node->setSkewX(number(p)); break;
+        case P_setSkewY: node->setSkewY(number(p)); break;
+        case P_setTag: node->setTag(number(p)); break;
+        // Sprite
+        case P_setSpriteFrame: static_cast<Sprite*>(node)->setSpriteFrame(string(p.s[0])); break;
+        case P_setCenterRectNormalized: static_cast<Sprite*>(node)->setCenterRectNormalized(Rect(p.f[0], p.f[1], p.f[2], p.f[3])); break;
+        case P_creator_tile_sprite: creator_tile_sprite(static_cast<Sprite*>(node)); break;
+        // Label
+        case P_setHorizontalAlignment: static_cast<Label*>(node)->setHorizontalAlignment(static_cast<TextHAlignment>(p.i[0])); break;
+        case P_setVerticalAlignment: static_cast<Label*>(node)->setVerticalAlignment(static_cast<TextVAlignment>(p.i[0])); break;
+        case P_setBMFontSize: static_cast<Label*>(node)->setBMFontSize(number(p)); break;
+        case P_setLineHeight: static_cast<Label*>(node)->setLineHeight(number(p)); break;
+        // Button
+        case P_ignoreContentAdaptWithSize: static_cast<ui::Widget*>(node)->ignoreContentAdaptWithSize(p.i[0] != 0); break;
+        // EditBox
+        case P_setReturnType: static_cast<ui::EditBox*>(node)->setReturnType(static_cast<ui::EditBox::KeyboardReturnType>(p.i[0])); break;
+        case P_setInputFlag: static_cast<ui::EditBox*>(node)->setInputFlag(static_cast<ui::EditBox::InputFlag>(p.i[0])); break;
+        case P_setInputMode: static_cast<ui::EditBox*>(node)->setInputMode(static_cast<ui::EditBox::InputMode>(p.i[0])); break;
+        case P_setFontSize: static_cast<ui::EditBox*>(node)->setFontSize(number(p)); break;
+        case P_setFontColor: static_cast<ui::EditBox*>(node)->setFontColor(Color3B(p.i[0], p.i[1], p.i[2])); break;
+        case P_setPlaceHolder: static_cast<ui::EditBox*>(node)->setPlaceHolder(string(p.s[0])); break;
+        case P_setPlaceholderFontSize: static_cast<ui::EditBox*>(node)->setPlaceholderFontSize(number(p)); break;
+        case P_setPlaceholderFontColor: static_cast<ui::EditBox*>(node)->setPlaceholderFontColor(Color3B(p.i[0], p.i[1], p.i[2])); break;
+        case P_setMaxLength: static_cast<ui::EditBox*>(node)->setMaxLength(number(p)); break;
+        case P_setText: static_cast<ui::EditBox*>(node)->setText(string(p.s[0])); break;
+        // LoadingBar
+        case P_setPercent: static_cast<ui::LoadingBar*>(node)->setPercent(number(p)); break;
+        // ScrollView
+        case P_setBackGroundImageColor: static_cast<ui::ScrollView*>(node)->setBackGroundImageColor(Color3B(p.i[0], p.i[1], p.i[2])); break;
+        case P_setBackGroundImage: static_cast<ui::ScrollView*>(node)->setBackGroundImage(string(p.s[0]), ui::Widget::TextureResType::PLIST); break;
+        case P_setBackGroundImageScale9Enabled: static_cast<ui::ScrollView*>(node)->setBackGroundImageScale9Enabled(p.i[0] != 0); break;
+        case P_setDirection: static_cast<ui::ScrollView*>(node)->setDirection(static_cast<ui::ScrollView::Direction>(p.i[0])); break;
+        case P_setBounceEnabled: static_cast<ui::ScrollView*>(node)->setBounceEnabled(p.i[0] != 0); break;
+        case P_setInnerContainerSize: static_cast<ui::ScrollView*>(node)->setInnerContainerSize(Size(p.f[0], p.f[1])); break;
+        case P_jumpToPercentVertical: static_cast<ui::ScrollView*>(node)->jumpToPercentVertical(number(p)); break;
+        case P_jumpToPercentHorizontal: static_cast<ui::ScrollView*>(node)->jumpToPercentHorizontal(number(p)); break;
+        default:
+            CCLOG("creator_load_scene: unknown property %d", p.setter);
+        }
+    }
+
+    static void addChild(Node* parent, uint8_t parentKind, Node* child)
+    {
+        // buttons use their child label as title
+        if (parentKind == K_UI_BUTTON)
+            static_cast<ui::Button*>(parent)->setTitleLabel(static_cast<Label*>(child));
+        else
+            parent->addChild(child);
+    }
+
+    const Header* _header;
+    const NodeRecord* _nodes;
+    const PropertyRecord* _properties;
+    const uint32_t* _stringOffsets;
+    const char* _stringData;
+};
+
+} // namespace
+
+Node* creator_load_scene(const std::string& filename)
+{
+    SceneFile file(filename);
+    auto header = reinterpret_cast<const Header*>(file.bytes());
+    if (file.size() < sizeof(Header) || memcmp(header->magic, "CSCN", 4) != 0 || header->version != FORMAT_VERSION)
+    {
+        CCLOG("creator_load_scene: invalid file %s", filename.c_str());
+        return nullptr;
+    }
+    return SceneBuilder(file.bytes()).build();
+}
+
+////// AUTOGENERATED:END//////
+"""
 
 
 ################################################################################
@@ -738,70 +1954,386 @@ class ScrollView(Node):
 # bootstrap + helper functions
 #
 ################################################################################
-def populate_meta_files(path):
-    global g_meta_data, g_sprite_frames, g_textures
-    global g_sprite_with_atlas, g_sprite_without_atlas
-    metas1 = glob.glob(path + '/*.meta')
-    metas2 = glob.glob('temp/*/*/*.meta')
-    metas = metas1 + metas2
-    print(metas)
-    for meta_filename in metas:
-        with open(meta_filename) as fd:
-            basename = os.path.basename(meta_filename)
-            j_data = json.load(fd)
-            g_meta_data[basename] = j_data
+def iter_json_array(fd, chunk_size=1 << 20):
+    '''yields the elements of the JSON array stored in fd one by one,
+       reading the file in chunks instead of loading it whole
+    '''
+    decoder = json.JSONDecoder()
+    buf = ''
+    pos = 0
+    eof = False
+    # what comes next: '[', a 'value' (or ']' if 'first'), or 'separator'
+    state = '['
+    while True:
+        while pos < len(buf) and buf[pos] in ' \t\r\n':
+            pos += 1
+        if pos == len(buf):
+            if eof:
+                raise ValueError("Unexpected end of JSON array")
+            buf = fd.read(chunk_size)
+            pos = 0
+            eof = not buf
+            continue
+
+        c = buf[pos]
+        if state == '[':
+            if c != '[':
+                raise ValueError("Expected a JSON array, got '%s'" % c)
+            pos += 1
+            state = 'first'
+        elif c == ']' and state in ('first', 'separator'):
+            return
+        elif state == 'separator':
+            if c != ',':
+                raise ValueError("Expected ',' or ']', got '%s'" % c)
+            pos += 1
+            state = 'value'
+        else:
+            try:
+                obj, end = decoder.raw_decode(buf, pos)
+                # a number could continue in the next chunk
+                complete = end < len(buf) or eof
+            except ValueError:
+                if eof:
+                    raise
+                complete = False
+            if not complete:
+                chunk = fd.read(chunk_size)
+                buf = buf[pos:] + chunk
+                pos = 0
+                eof = not chunk
+                continue
+            yield obj
+            pos = end
+            state = 'separator'
+
+
+# keys of the compacted objects are shared among all of them
+g_interned_keys = {}
+
+def compact_fire_value(value):
+    '''values without the __type__ of the nested objects (cc.Vec2, cc.Color...)'''
+    if isinstance(value, dict):
+        return dict((g_interned_keys.setdefault(k, k), compact_fire_value(v))
+                for k, v in value.iteritems() if k != '__type__')
+    elif isinstance(value, list):
+        return [compact_fire_value(v) for v in value]
+    return value
+
+
+def compact_fire_object(obj):
+    '''keeps only the fields of obj that are read by the converters'''
+    fields = FIRE_FIELDS.get(obj['__type__'], ('__type__',))
+    return dict((k, compact_fire_value(obj[k])) for k in fields if k in obj)
+
+
+def load_fire_file(filename):
+    if g_ctx.options.get('low_memory'):
+        with open(filename) as data_file:
+            return [compact_fire_object(obj) for obj in iter_json_array(data_file)]
+
+    # the converters don't modify the loaded data, so --watch can reuse it
+    stamp = get_file_stamp(filename)
+    if g_memory_cache is not None:
+        cached = g_memory_cache['scenes'].get(filename)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+    with open(filename) as data_file:
+        json_data = json.load(data_file)
+    if g_memory_cache is not None:
+        g_memory_cache['scenes'][filename] = (stamp, json_data)
+    return json_data
+
+
+def build_component_index():
+    '''groups the components of every node by __type__, and guesses the
+       type of the nodes, in a single pass over the scene
+    '''
+    json_data = g_ctx.json_data
+    for node_idx, obj in enumerate(json_data):
+        if '_components' not in obj:
+            continue
+        components = {}
+        for idx in obj['_components']:
+            component = json_data[idx['__id__']]
+            components.setdefault(component['__type__'], []).append(component)
+        g_ctx.components[node_idx] = components
+        g_ctx.node_types[node_idx] = Node.guess_type_from_components(components)
+
+
+@contextlib.contextmanager
+def phase(name):
+    '''adds the time spent in the block to g_ctx.phase_times[name]'''
+    start = time.time()
+    try:
+        yield
+    finally:
+        g_ctx.phase_times[name] = g_ctx.phase_times.get(name, 0) + time.time() - start
 
-            meta_uuid = j_data['uuid']
 
-            # is this a sprite (.png) file ?
-            if 'type' in j_data and (j_data['type'] == 'sprite' or j_data['type'] == 'Texture Packer'):
-                # subMetas seems to contain all the sprite frame definitions
-                submetas = j_data['subMetas']
-                for spriteframename in submetas:
-                    # uuid will be used as the key
-                    uuid = submetas[spriteframename]['uuid']
-                    submetas[spriteframename]['frameName'] = spriteframename
+def get_peak_memory():
+    '''peak resident memory of the process, in bytes. None if unknown'''
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on OS X
+    if sys.platform != 'darwin':
+        peak *= 1024
+    return peak
 
-                    # populate g_sprite_frames
-                    g_sprite_frames[uuid] = submetas[spriteframename]
 
-                    # populate g_textures. The name is meta_filename - '.meta' (5 chars)
-                    if 'rawTextureUuid' in submetas[spriteframename]:
-                        texture_uuid = submetas[spriteframename]['rawTextureUuid']
-                        g_textures[texture_uuid] = os.path.basename(meta_filename[:-5])
-                    else:
-                        print('Framename "%s" doesn\'t have rawTextureUuid. Ignoring it...' % submetas[spriteframename]['frameName'])
+def get_asset_index_filename(path):
+    return path + '/../library/creator-parser-index.json'
 
-                    if j_data['type'] == 'sprite':
-                        g_sprite_without_atlas[uuid] = submetas[spriteframename]
-                    elif j_data['type'] == 'Texture Packer':
-                        g_sprite_with_atlas.append(Node.get_filepath_from_uuid(meta_uuid))
-                        g_sprite_without_atlas[uuid] = submetas[spriteframename]
-                    else:
-                        raise Exception("Invalid type: %s" % j_data['type'])
 
+def load_asset_index(filename):
+    '''returns the asset index saved by a previous run, or None when
+       it is missing, corrupted or from another ASSET_INDEX_VERSION
+    '''
+    if g_memory_cache is not None and filename in g_memory_cache['indexes']:
+        return g_memory_cache['indexes'][filename]
+    try:
+        with open(filename) as fd:
+            index = json.load(fd)
+    except (IOError, ValueError):
+        return None
+    if index.get('version') != ASSET_INDEX_VERSION:
+        return None
+    if g_memory_cache is not None:
+        g_memory_cache['indexes'][filename] = index
+    return index
+
+
+def save_asset_index(filename, index):
+    # a concurrent run never sees a half-written index
+    write_file_atomically(filename, json.dumps(index))
+    if g_memory_cache is not None:
+        g_memory_cache['indexes'][filename] = index
+
+
+def get_file_stamp(filename):
+    s = os.stat(filename)
+    return [s.st_mtime, s.st_size]
+
+
+def get_meta_stamp(meta_filename, uuid):
+    '''a parsed .meta can be reused while neither the file nor its
+       library/uuid-to-mtime.json entry change
+    '''
+    entry = g_ctx.uuid.get(uuid, {})
+    return [os.path.getmtime(meta_filename), entry.get('asset'), entry.get('meta'), entry.get('relativePath')]
+
+
+def merge_meta_file(meta_filename, j_data):
+    basename = os.path.basename(meta_filename)
+    g_ctx.meta_data[basename] = j_data
+
+    meta_uuid = j_data['uuid']
+
+    # is this a sprite (.png) file ?
+    if 'type' in j_data and (j_data['type'] == 'sprite' or j_data['type'] == 'Texture Packer'):
+        # subMetas seems to contain all the sprite frame definitions
+        submetas = j_data['subMetas']
+        for spriteframename in submetas:
+            # uuid will be used as the key
+            uuid = submetas[spriteframename]['uuid']
+            submetas[spriteframename]['frameName'] = spriteframename
+
+            # populate g_ctx.sprite_frames
+            g_ctx.sprite_frames[uuid] = submetas[spriteframename]
+
+            # populate g_ctx.textures. The name is meta_filename - '.meta' (5 chars)
+            if 'rawTextureUuid' in submetas[spriteframename]:
+                texture_uuid = submetas[spriteframename]['rawTextureUuid']
+                g_ctx.textures[texture_uuid] = os.path.basename(meta_filename[:-5])
+            elif j_data['type'] != 'Texture Packer':
+                # the texture of a Texture Packer frame is named by its .plist
+                logger.warning('Framename "%s" doesn\'t have rawTextureUuid. Ignoring it...', submetas[spriteframename]['frameName'])
+
+            if j_data['type'] == 'sprite':
+                g_ctx.sprite_without_atlas[uuid] = submetas[spriteframename]
+            elif j_data['type'] == 'Texture Packer':
+                # not a dependency yet: only merged when the index is cold.
+                # The scenes resolve the .plist when they use its frames
+                g_ctx.sprite_with_atlas.append(g_ctx.uuid.get(meta_uuid, {}).get('relativePath'))
+                g_ctx.sprite_without_atlas[uuid] = submetas[spriteframename]
+                # the geometry is read from the .plist. see get_sprite_frame_geometry()
+                submetas[spriteframename]['atlasUuid'] = meta_uuid
+            else:
+                raise Exception("Invalid type: %s" % j_data['type'])
+
+
+def find_meta_files(path):
+    '''the .meta files of the whole assets tree, plus the ones in temp/.
+       Sorted, so the tables are merged in the same order everywhere
+    '''
+    metas = []
+    for dirpath, dirnames, filenames in os.walk(path):
+        metas.extend(os.path.join(dirpath, f) for f in filenames if f.endswith('.meta'))
+    metas.sort()
+    return metas + sorted(glob.glob('temp/*/*/*.meta'))
+
+
+def read_meta_file(args):
+    '''(meta_filename, cached record) -> record of the .meta file.
+       The cached one is returned while it is up to date.
+       Runs in the threads of populate_meta_files()
+    '''
+    meta_filename, record = args
+    if record is None or record['stamp'] != get_meta_stamp(meta_filename, record['data']['uuid']):
+        with open(meta_filename) as fd:
+            j_data = json.load(fd)
+        record = {'stamp': get_meta_stamp(meta_filename, j_data['uuid']),
+                  'data': j_data}
+    return record
+
+
+def populate_meta_files(path, index=None):
+    '''parses the .meta files, in META_SCAN_THREADS threads. Metas
+       already in `index` are only re-read when their stamp changed.
+       Returns the per-meta records and whether any of them was re-read
+    '''
+    metas = find_meta_files(path)
+    logger.debug("%s", metas)
+
+    cached = index['metas'] if index is not None else {}
+    jobs = [(meta_filename, cached.get(meta_filename)) for meta_filename in metas]
+    threads = min(META_SCAN_THREADS, len(jobs))
+    if threads > 1:
+        pool = multiprocessing.pool.ThreadPool(threads)
+        try:
+            # map() keeps the order of the jobs
+            results = pool.map(read_meta_file, jobs, chunksize=64)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        results = [read_meta_file(job) for job in jobs]
+
+    records = dict(zip(metas, results))
+    # without an index there are no tables to reuse, even with no metas
+    changed = index is None or len(metas) != len(cached) or any(r is not job[1] for r, job in zip(results, jobs))
+
+    if not changed:
+        # nothing to merge: reuse the tables from the previous run
+        tables = index['tables']
+        g_ctx.meta_data = dict((os.path.basename(k), records[k]['data']) for k in records)
+        g_ctx.sprite_frames = tables['sprite_frames']
+        g_ctx.textures = tables['textures']
+        g_ctx.sprite_with_atlas = tables['sprite_with_atlas']
+        for uuid in tables['sprite_without_atlas']:
+            g_ctx.sprite_without_atlas[uuid] = g_ctx.sprite_frames[uuid]
+    else:
+        for meta_filename in metas:
+            merge_meta_file(meta_filename, records[meta_filename]['data'])
+    return records, changed
+
+
+def populate_uuid_file(path, index=None):
+    '''loads library/uuid-to-mtime.json, unless `index` already has an
+       up to date copy of it. Returns the stamp of the file'''
+    filename = path + '/../library/uuid-to-mtime.json'
+    stamp = get_file_stamp(filename)
+    if index is not None and index['uuid_stamp'] == stamp:
+        g_ctx.uuid = index['uuid']
+    else:
+        with open(filename) as data:
+            g_ctx.uuid = json.load(data)
+    return stamp
 
-def populate_uuid_file(path):
-    global g_uuid
-    with open(path + '/../library/uuid-to-mtime.json') as data:
-        g_uuid = json.load(data)
 
+def populate_asset_tables(path):
+    '''fills the uuid, sprite frame and texture tables.
+       The tables are cached in library/creator-parser-index.json, so a
+       run only parses the .meta files that changed since the previous one
+    '''
+    index_filename = get_asset_index_filename(path)
+    index = load_asset_index(index_filename)
 
-def to_cpp_setup():
+    # 1st
+    with phase('uuid'):
+        uuid_stamp = populate_uuid_file(path, index)
+    # 2nd
+    with phase('metas'):
+        records, changed = populate_meta_files(path, index)
+
+    if changed or index['uuid_stamp'] != uuid_stamp:
+        index = {
+            'version': ASSET_INDEX_VERSION,
+            'uuid_stamp': uuid_stamp,
+            'uuid': g_ctx.uuid,
+            'metas': records,
+            'tables': {
+                'sprite_frames': g_ctx.sprite_frames,
+                'textures': g_ctx.textures,
+                'sprite_with_atlas': g_ctx.sprite_with_atlas,
+                'sprite_without_atlas': list(g_ctx.sprite_without_atlas),
+                }
+            }
+        save_asset_index(index_filename, index)
+
+
+def to_cpp_setup(scene_obj):
     header = """
 USING_NS_CC;
 
 bool %s_init()
-{""" % g_filename
+{""" % g_ctx.filename
 
     footer = """
     return true;
 }
 """
-    g_file_cpp.write(header)
+    g_ctx.cpp.write(header)
     to_cpp_setup_design_resolution()
-    to_cpp_setup_sprite_frames()
-    g_file_cpp.write(footer)
+    if g_ctx.options.get('shared_assets'):
+        # the sprite frames are registered by creator_assets.cpp
+        g_ctx.cpp.write('    creator_assets_init();\n')
+    else:
+        to_cpp_setup_sprite_frames(g_ctx.filename)
+    to_cpp_setup_glyphs(scene_obj)
+    g_ctx.cpp.write(footer)
+
+
+def to_cpp_shared_assets(path, used_sprite_frames):
+    '''emitters of creator_assets.h/.cpp, the setup shared by all the
+       scenes of path when --shared-assets is used.
+       used_sprite_frames: uuids to register. None registers all of them
+    '''
+    h = Emitter('cpp/creator_assets.h')
+    h.write("""
+////// AUTOGENERATED:BEGIN //////
+////// DO     NOT     EDIT //////
+#pragma once
+
+// registers the sprite frames used by the scenes. Only the first call does it
+void creator_assets_init();
+
+////// AUTOGENERATED:END//////
+""")
+
+    g_ctx.cpp = Emitter('cpp/creator_assets.cpp')
+    g_ctx.used_sprite_frames = used_sprite_frames
+    g_ctx.path = path
+    populate_asset_tables(path)
+    g_ctx.cpp.write("////// AUTOGENERATED:BEGIN //////\n")
+    g_ctx.cpp.write("////// DO     NOT     EDIT //////\n")
+    g_ctx.cpp.write("\n#include <cocos2d.h>\n")
+    g_ctx.cpp.write('#include "creator_assets.h"\n')
+    g_ctx.cpp.write("""
+USING_NS_CC;
+
+void creator_assets_init()
+{
+    static bool initialized = false;
+    if (initialized)
+        return;
+    initialized = true;
+""")
+    to_cpp_setup_sprite_frames('creator_assets')
+    g_ctx.cpp.write("}\n")
+    g_ctx.cpp.write("////// AUTOGENERATED:END//////\n")
+    return [h, g_ctx.cpp] + g_ctx.atlas_pages
 
 
 def to_cpp_setup_design_resolution():
@@ -809,7 +2341,7 @@ def to_cpp_setup_design_resolution():
     auto director = Director::getInstance();
     auto glview = director->getOpenGLView();
     glview->setDesignResolutionSize(%d, %d, ResolutionPolicy::EXACT_FIT);
-""" % ( g_design_resolution['width'], g_design_resolution['height'])
+""" % ( g_ctx.design_resolution['width'], g_ctx.design_resolution['height'])
 
     design_resolution = """
     auto director = Director::getInstance();
@@ -818,51 +2350,184 @@ def to_cpp_setup_design_resolution():
     glview->setDesignResolutionSize(%s, %s, ResolutionPolicy::NO_BORDER);
 """
 
-    if g_fit_height and g_fit_width:
-        g_file_cpp.write(design_resolution_exact_fit)
-    elif g_fit_height:
+    if g_ctx.fit_height and g_ctx.fit_width:
+        g_ctx.cpp.write(design_resolution_exact_fit)
+    elif g_ctx.fit_height:
         expanded = design_resolution % (
-                "frameSize.width / (frameSize.height / %d)" % g_design_resolution['height'],
-                "frameSize.height / (frameSize.height / %d)" % g_design_resolution['height'])
-        g_file_cpp.write(expanded)
-    elif g_fit_width:
+                "frameSize.width / (frameSize.height / %d)" % g_ctx.design_resolution['height'],
+                "frameSize.height / (frameSize.height / %d)" % g_ctx.design_resolution['height'])
+        g_ctx.cpp.write(expanded)
+    elif g_ctx.fit_width:
         expanded = design_resolution % (
-                "frameSize.width / (frameSize.width / %d)" % g_design_resolution['width'],
-                "frameSize.height / (frameSize.width / %d)" % g_design_resolution['width'])
-        g_file_cpp.write(expanded)
+                "frameSize.width / (frameSize.width / %d)" % g_ctx.design_resolution['width'],
+                "frameSize.height / (frameSize.width / %d)" % g_ctx.design_resolution['width'])
+        g_ctx.cpp.write(expanded)
     else:
         expanded = design_resolution % (
-                str(g_design_resolution['width']),
-                str(g_design_resolution['height']))
-        g_file_cpp.write(expanded)
+                str(g_ctx.design_resolution['width']),
+                str(g_ctx.design_resolution['height']))
+        g_ctx.cpp.write(expanded)
 
 
-def to_cpp_setup_sprite_frames():
-    g_file_cpp.write('\n    // BEGIN SpriteFrame loading\n')
-    g_file_cpp.write('    auto spriteFrameCache = SpriteFrameCache::getInstance();\n')
+def parse_plist_numbers(value):
+    '''"{{x,y},{w,h}}", "{x,y}"... -> list of numbers'''
+    return [float(n) for n in value.replace('{', '').replace('}', '').split(',')]
 
-    g_file_cpp.write('    // Files from .plist\n')
-    for k in Set(g_sprite_with_atlas):
-        g_file_cpp.write('    // %s processed manually. No need to include it in the assets folder\n' % (g_assetpath + k))
-        #g_file_cpp.write('    spriteFrameCache->addSpriteFramesWithFile("%s");\n' % (g_assetpath + k))
 
-    g_file_cpp.write('\n    // Files from .png\n')
-    for k in g_sprite_without_atlas:
-        sprite_frame = g_sprite_frames[k]
-        if 'rawTextureUuid' in sprite_frame:
-            texture_filename = Node.get_filepath_from_uuid(sprite_frame['rawTextureUuid'])
+def load_atlas_plist(filename):
+    '''frames of the atlas .plist `filename` (relative to g_ctx.path):
+       {frame name: geometry}, with the keys of the sprite frame metas.
+       Supports the formats read by SpriteFrameCache (0 to 3). Parsed once
+       per run. None if it can't be read
+    '''
+    if filename in g_ctx.atlas_plists:
+        return g_ctx.atlas_plists[filename]
+
+    frames = None
+    add_dependency(filename)
+    try:
+        plist = plistlib.readPlist(os.path.join(g_ctx.path, filename))
+        fmt = plist.get('metadata', {}).get('format', 0)
+        metadata = plist.get('metadata', {})
+        if 'size' in metadata:
+            g_ctx.atlas_sizes[filename] = tuple(int(n) for n in parse_plist_numbers(metadata['size']))
+        texture = metadata.get('realTextureFileName') or metadata.get('textureFileName')
+        if texture:
+            texture = os.path.normpath(os.path.join(os.path.dirname(filename), texture))
+            add_dependency(texture)
+            if os.path.isfile(os.path.join(g_ctx.path, texture)):
+                g_ctx.atlas_textures[filename] = texture
+        frames = {}
+        for name, data in plist['frames'].items():
+            if fmt == 0:
+                rect = [data['x'], data['y'], data['width'], data['height']]
+                rotated = False
+                offset = [data['offsetX'], data['offsetY']]
+                size = [abs(data['originalWidth']), abs(data['originalHeight'])]
+            elif fmt in (1, 2):
+                rect = parse_plist_numbers(data['frame'])
+                rotated = data.get('rotated', False)
+                offset = parse_plist_numbers(data['offset'])
+                size = parse_plist_numbers(data['sourceSize'])
+            elif fmt == 3:
+                # the polygon data (vertices, triangles) is not used
+                rect = parse_plist_numbers(data['textureRect'])
+                rotated = data.get('textureRotated', False)
+                offset = parse_plist_numbers(data['spriteOffset'])
+                size = parse_plist_numbers(data['spriteSourceSize'])
+            else:
+                raise Exception("Unsupported format: %s" % fmt)
+            frames[name] = {'x': rect[0], 'y': rect[1], 'width': rect[2], 'height': rect[3],
+                            'rotated': rotated,
+                            'offsetX': offset[0], 'offsetY': offset[1],
+                            'rawWidth': size[0], 'rawHeight': size[1]}
+    except Exception as e:
+        logger.warning("Can't read the atlas %s (%s). Using the geometry from its .meta", filename, e)
+        frames = None
+    g_ctx.atlas_plists[filename] = frames
+    return frames
+
+
+def get_sprite_frame_texture_file(sprite_frame):
+    '''texture of a sprite frame meta, relative to g_ctx.path. The frames
+       of a Texture Packer atlas may only have it in their .plist. None if
+       unknown
+    '''
+    if 'rawTextureUuid' in sprite_frame:
+        return Node.get_filepath_from_uuid(sprite_frame['rawTextureUuid'])
+    if 'atlasUuid' in sprite_frame:
+        plist_filename = Node.get_filepath_from_uuid(sprite_frame['atlasUuid'])
+        if load_atlas_plist(plist_filename) is not None:
+            return g_ctx.atlas_textures.get(plist_filename)
+    return None
+
+
+def get_sprite_frame_geometry(sprite_frame):
+    '''rect, rotation, offset and original size of a sprite frame meta.
+       The frames of a Texture Packer atlas come from its .plist: the
+       runtime doesn't have to parse it, and the .meta rounds the offsets
+    '''
+    if 'atlasUuid' in sprite_frame:
+        frames = load_atlas_plist(Node.get_filepath_from_uuid(sprite_frame['atlasUuid']))
+        if frames is not None and sprite_frame['frameName'] in frames:
+            return frames[sprite_frame['frameName']]
+    return {'x': sprite_frame['trimX'], 'y': sprite_frame['trimY'],
+            'width': sprite_frame['width'], 'height': sprite_frame['height'],
+            'rotated': sprite_frame['rotated'],
+            'offsetX': sprite_frame['offsetX'], 'offsetY': sprite_frame['offsetY'],
+            'rawWidth': sprite_frame['rawWidth'], 'rawHeight': sprite_frame['rawHeight']}
+
+
+def add_texture_size(texture_filename, sprite_frame, geometry, x, y, packed):
+    '''grows g_ctx.texture_sizes[texture_filename] to hold a sprite frame at
+       x, y. A frame that is not in an atlas uses the whole texture: its
+       rawWidth/rawHeight. The size of an atlas comes from its .plist
+    '''
+    w, h = geometry['width'], geometry['height']
+    if geometry['rotated']:
+        w, h = h, w
+    width, height = x + w, y + h
+    if 'atlasUuid' in sprite_frame and not packed:
+        atlas_size = g_ctx.atlas_sizes.get(Node.get_filepath_from_uuid(sprite_frame['atlasUuid']))
+        if atlas_size is not None:
+            width, height = atlas_size
+    elif not packed:
+        width, height = max(width, geometry['rawWidth']), max(height, geometry['rawHeight'])
+    old_width, old_height = g_ctx.texture_sizes.get(texture_filename, (0, 0))
+    g_ctx.texture_sizes[texture_filename] = (max(old_width, int(width)), max(old_height, int(height)))
+
+
+def to_cpp_setup_sprite_frames(basename):
+    '''basename: prefix of the atlas pages, if --pack-atlas is used'''
+    g_ctx.cpp.write('\n    // BEGIN SpriteFrame loading\n')
+    g_ctx.cpp.write('    auto spriteFrameCache = SpriteFrameCache::getInstance();\n')
+
+    # sorted: the tables may come from the asset index or from the .meta files,
+    # and both should generate the same code
+    frames = g_ctx.sprite_without_atlas
+    if g_ctx.used_sprite_frames is not None:
+        frames = dict((k, frames[k]) for k in g_ctx.used_sprite_frames if k in frames)
+    keys = sorted(frames, key=lambda k: (frames[k]['frameName'], k))
+
+    # the atlases with a frame whose texture is unknown are loaded at runtime
+    runtime_plists = set()
+    for sprite_frame in g_ctx.sprite_without_atlas.values():
+        if 'atlasUuid' in sprite_frame and get_sprite_frame_texture_file(sprite_frame) is None:
+            runtime_plists.add(Node.get_filepath_from_uuid(sprite_frame['atlasUuid']))
+
+    g_ctx.cpp.write('    // Files from .plist\n')
+    for k in sorted(Set(g_ctx.sprite_with_atlas)):
+        if k in runtime_plists:
+            g_ctx.cpp.write('    spriteFrameCache->addSpriteFramesWithFile("%s");\n' % (g_ctx.assetpath + k))
+        else:
+            g_ctx.cpp.write('    // %s read at build time. No need to include it in the assets folder\n' % (g_ctx.assetpath + k))
+
+    g_ctx.cpp.write('\n    // Files from .png\n')
+    packed = {}
+    if g_ctx.options.get('pack_atlas'):
+        packed = pack_sprite_frames(keys, basename)
+    for k in keys:
+        sprite_frame = g_ctx.sprite_frames[k]
+        texture_filename = get_sprite_frame_texture_file(sprite_frame)
+        if texture_filename is not None:
+            geometry = get_sprite_frame_geometry(sprite_frame)
+            x, y = geometry['x'], geometry['y']
+            if k in packed:
+                texture_filename, x, y = packed[k]
+            g_ctx.sprite_frame_textures[k] = texture_filename
+            add_texture_size(texture_filename, sprite_frame, geometry, x, y, k in packed)
 
             original_frame_name = sprite_frame['frameName']
             sprite_frame_name = original_frame_name.replace('-','_')
             sprite_frame_name = sprite_frame_name.replace('.','_')
             cpp_sprite_frame = '    auto sf_%s = SpriteFrame::create("%s", Rect(%g, %g, %g, %g), %s, Vec2(%g, %g), Size(%g, %g));\n' % (
                     sprite_frame_name,
-                    g_assetpath + texture_filename,
-                    sprite_frame['trimX'], sprite_frame['trimY'], sprite_frame['width'], sprite_frame['height'],
-                    str(sprite_frame['rotated']).lower(),
-                    sprite_frame['offsetX'], sprite_frame['offsetY'],
-                    sprite_frame['rawWidth'], sprite_frame['rawHeight'])
-            g_file_cpp.write(cpp_sprite_frame)
+                    g_ctx.assetpath + texture_filename,
+                    x, y, geometry['width'], geometry['height'],
+                    str(geometry['rotated']).lower(),
+                    geometry['offsetX'], geometry['offsetY'],
+                    geometry['rawWidth'], geometry['rawHeight'])
+            g_ctx.cpp.write(cpp_sprite_frame)
 
             # does it have a capInsets?
             if sprite_frame['borderTop'] != 0 or sprite_frame['borderBottom'] != 0 or sprite_frame['borderLeft'] != 0 or sprite_frame['borderRight'] != 0:
@@ -870,19 +2535,143 @@ def to_cpp_setup_sprite_frames():
                 y = sprite_frame['borderTop']
                 w = sprite_frame['width'] - sprite_frame['borderRight'] - x
                 h = sprite_frame['height'] - sprite_frame['borderBottom'] - y
-                g_file_cpp.write('    sf_%s->setCenterRectInPixels(Rect(%d,%d,%d,%d));\n' % (
+                g_ctx.cpp.write('    sf_%s->setCenterRectInPixels(Rect(%d,%d,%d,%d));\n' % (
                     sprite_frame_name,
                     x, y, w, h
                     ))
-            g_file_cpp.write('    spriteFrameCache->addSpriteFrame(sf_%s, "%s");\n' % (
+            g_ctx.cpp.write('    spriteFrameCache->addSpriteFrame(sf_%s, "%s");\n' % (
                 sprite_frame_name,
                 original_frame_name))
-        else:
-            print("Ignoring '%s'... No rawTextureUuid" % sprite_frame['frameName'])
-    g_file_cpp.write('    // END SpriteFrame loading\n')
+        elif 'atlasUuid' not in sprite_frame:
+            logger.warning("Ignoring '%s'... No rawTextureUuid", sprite_frame['frameName'])
+    g_ctx.cpp.write('    // END SpriteFrame loading\n')
+
+
+def to_cpp_string(text):
+    '''C++ string literal of text'''
+    return '"%s"' % text.replace('\\', '\\\\').replace('"', '\\"').replace('\t', '\\t').replace('\n', '\\n')
+
+
+def to_cpp_setup_glyphs(scene_obj):
+    '''fills the font atlases of the labels with the glyphs they draw, so
+       they are not rasterized on the first frame where the text appears.
+       The atlases stay in the FontAtlasCache, where the labels find them:
+       getFontAtlasTTF/FNT() retain them, so only the first call does it
+    '''
+    glyphs = {}
+    scene_obj.collect_glyphs(glyphs)
+    if not glyphs:
+        return
+
+    g_ctx.cpp.write('\n    // BEGIN Glyph prewarming\n')
+    g_ctx.cpp.write('    static bool glyphsPrewarmed = false;\n')
+    g_ctx.cpp.write('    if (!glyphsPrewarmed) {\n')
+    g_ctx.cpp.write('        glyphsPrewarmed = true;\n')
+    if any(font_type != Label.FONT_BM for font_type, font_filename, font_size in glyphs):
+        g_ctx.cpp.write('        std::u16string glyphs;\n')
+    for i, font_atlas in enumerate(sorted(glyphs)):
+        font_type, font_filename, font_size = font_atlas
+        if font_type == Label.FONT_BM:
+            g_ctx.cpp.write('        FontAtlasCache::getFontAtlasFNT("%s");\n' % (g_ctx.assetpath + font_filename))
+            continue
+        # same TTFConfig as Label::createWithTTF()
+        g_ctx.cpp.write('        TTFConfig ttfConfig_%d("%s", %s, GlyphCollection::DYNAMIC);\n' % (i, g_ctx.assetpath + font_filename, font_size))
+        g_ctx.cpp.write('        StringUtils::UTF8ToUTF16(%s, glyphs);\n' % to_cpp_string(''.join(sorted(glyphs[font_atlas]))))
+        g_ctx.cpp.write('        FontAtlasCache::getFontAtlasTTF(&ttfConfig_%d)->prepareLetterDefinitions(glyphs);\n' % i)
+    g_ctx.cpp.write('    }\n')
+    g_ctx.cpp.write('    // END Glyph prewarming\n')
 
 
-def create_file(filename):
+################################################################################
+#
+# Atlas packing (--pack-atlas)
+# The loose sprite frames are packed into a few textures, so they can be batched
+#
+################################################################################
+ATLAS_MAX_SIZE = 2048
+ATLAS_PADDING = 2
+
+
+def pack_sprite_frames(keys, basename):
+    '''packs the trimmed rects of the loose sprite frames `keys` into atlas
+       pages, added to g_ctx.atlas_pages as <basename>_atlas<n>.png.
+       Returns {uuid: (page filename, x, y)}. The frames that are not in it
+       (already in an atlas, rotated, too big, no texture, alone in their
+       page) keep their own texture
+    '''
+    if Image is None:
+        raise Exception("--pack-atlas needs PIL (pip install Pillow)")
+
+    textures = {}
+    images = {}
+    for k in keys:
+        sprite_frame = g_ctx.sprite_frames[k]
+        if 'rawTextureUuid' not in sprite_frame or 'atlasUuid' in sprite_frame:
+            continue
+        # the rect that to_cpp_setup_sprite_frames() emits
+        geometry = get_sprite_frame_geometry(sprite_frame)
+        if geometry['rotated']:
+            continue
+        w, h = int(geometry['width']), int(geometry['height'])
+        if w > ATLAS_MAX_SIZE or h > ATLAS_MAX_SIZE:
+            continue
+        texture_filename = Node.get_filepath_from_uuid(sprite_frame['rawTextureUuid'])
+        if texture_filename is None:
+            continue
+        if texture_filename not in textures:
+            try:
+                textures[texture_filename] = Image.open(os.path.join(g_ctx.path, texture_filename)).convert('RGBA')
+            except IOError as e:
+                logger.warning("Can't read %s (%s). Its sprite frames are not packed", texture_filename, e)
+                textures[texture_filename] = None
+        if textures[texture_filename] is None:
+            continue
+        x, y = int(geometry['x']), int(geometry['y'])
+        images[k] = textures[texture_filename].crop((x, y, x + w, y + h))
+
+    # shelf packing, tallest first. Ties are sorted like the emitted frames
+    order = sorted(images, key=lambda k: (-images[k].size[1], -images[k].size[0], keys.index(k)))
+    pages = []
+    page = {}
+    x = y = shelf_height = 0
+    for k in order:
+        w, h = images[k].size
+        if x + w > ATLAS_MAX_SIZE:
+            x = 0
+            y += shelf_height + ATLAS_PADDING
+            shelf_height = 0
+        if y + h > ATLAS_MAX_SIZE:
+            pages.append(page)
+            page = {}
+            x = y = shelf_height = 0
+        page[k] = (x, y)
+        x += w + ATLAS_PADDING
+        shelf_height = max(shelf_height, h)
+    if page:
+        pages.append(page)
+    # a page with a single frame would only be a copy of it
+    pages = [page for page in pages if len(page) > 1]
+
+    packed = {}
+    for i, page in enumerate(pages):
+        page_filename = '%s_atlas%d.png' % (basename, i)
+        width = max(x + images[k].size[0] for k, (x, y) in page.items())
+        height = max(y + images[k].size[1] for k, (x, y) in page.items())
+        atlas = Image.new('RGBA', (width, height), (0, 0, 0, 0))
+        for k, (x, y) in page.items():
+            atlas.paste(images[k], (x, y))
+            packed[k] = (page_filename, x, y)
+        data = io.BytesIO()
+        atlas.save(data, 'PNG')
+        emitter = Emitter('cpp/' + page_filename, binary=True)
+        emitter.write(data.getvalue())
+        g_ctx.atlas_pages.append(emitter)
+
+    logger.info("%s: packed %d sprite frames from %d textures into %d atlas pages", basename, len(packed), len([t for t in textures.values() if t is not None]), len(pages))
+    return packed
+
+
+def create_file(filename, mode="w"):
 
     if not os.path.exists(os.path.dirname(filename)):
         try:
@@ -890,54 +2679,946 @@ def create_file(filename):
         except OSError as exc: # Guard against race condition
             if exc.errno != errno.EEXIST:
                 raise
-    return open(filename, "w")
+    return open(filename, mode)
 
 
-def run(filename, assetpath):
-    global g_filename, g_file_cpp, g_file_h, g_assetpath
+def write_file_atomically(filename, data, mode="w"):
+    '''writes to a temp file and renames it, so filename is never
+       left half-written if the conversion crashes
+    '''
+    tmp_filename = '%s.%d.tmp' % (filename, os.getpid())
+    with create_file(tmp_filename, mode) as fd:
+        fd.write(data)
+    if os.name == 'nt' and os.path.exists(filename):
+        # rename doesn't replace files on Windows
+        os.remove(filename)
+    os.rename(tmp_filename, filename)
 
-    globals_init()
 
-    g_assetpath = assetpath
-    g_filename = os.path.splitext(os.path.basename(filename))[0]
-    cpp_name = "cpp/%s.cpp" % g_filename
-    h_name = "cpp/%s.h" % g_filename
+################################################################################
+#
+# build manifest: used to skip the scenes whose inputs didn't change
+#
+################################################################################
+def get_manifest_filename(path):
+    return path + '/../library/creator-parser-manifest.json'
 
-    g_file_cpp = create_file(cpp_name)
-    g_file_h = create_file(h_name)
 
-    path = os.path.dirname(filename)
-    # 1st
-    populate_uuid_file(path)
-    # 2nd
-    populate_meta_files(path)
+def load_manifest(filename):
+    try:
+        with open(filename) as fd:
+            manifest = json.load(fd)
+    except (IOError, ValueError):
+        manifest = None
+    if manifest is None or manifest.get('version') != MANIFEST_VERSION:
+        manifest = {'version': MANIFEST_VERSION, 'scenes': {}}
+    return manifest
+
+
+def save_manifest(filename, manifest):
+    write_file_atomically(filename, json.dumps(manifest, indent=2, sort_keys=True, separators=(',', ': ')))
+
+
+def get_file_hash(filename):
+    with open(filename, 'rb') as fd:
+        return hashlib.md5(fd.read()).hexdigest()
+
+
+def get_build_settings(assetpath, options=None):
+    '''everything, besides the input files, that changes the generated code'''
+    parser_filename = os.path.splitext(os.path.abspath(__file__))[0] + '.py'
+    options = options or {}
+    return {'assetpath': assetpath,
+            'parser': get_file_hash(parser_filename),
+            'options': dict((k, options[k]) for k in options if k not in RUNTIME_OPTIONS)}
+
+
+def get_sprite_frames_digest(uuids=None):
+    '''digest of the sprite frames registered by the scene:
+       the ones in `uuids`, or all of them if it is None
+    '''
+    frames = g_ctx.sprite_without_atlas
+    if uuids is not None:
+        frames = dict((k, frames.get(k)) for k in uuids)
+    textures = {}
+    for k in frames:
+        texture_uuid = frames[k].get('rawTextureUuid') if frames[k] is not None else None
+        if texture_uuid in g_ctx.uuid:
+            textures[texture_uuid] = g_ctx.uuid[texture_uuid]['relativePath']
+    tables = [frames, sorted(Set(g_ctx.sprite_with_atlas)), textures]
+    return hashlib.md5(json.dumps(tables, sort_keys=True)).hexdigest()
+
+
+def get_shared_sprite_frame_textures(uuids=None):
+    '''{uuid: texture} of the sprite frames `uuids` (all of them if None)
+       registered by creator_assets.cpp. See load_shared_assets()
+    '''
+    frames = g_ctx.sprite_without_atlas
+    textures = {}
+    for k in (uuids if uuids is not None else frames):
+        texture_filename = get_sprite_frame_texture(k) if k in frames else None
+        if texture_filename is not None:
+            textures[k] = texture_filename
+    return textures
+
+
+def get_shared_assets_digest(uuids=None):
+    '''digest of what the scene took from creator_assets.cpp: the textures
+       of its sprite frames `uuids` and, with --report, their sizes
+    '''
+    textures = get_shared_sprite_frame_textures(uuids)
+    sizes = {}
+    if g_ctx.options.get('report'):
+        sizes = dict((t, g_ctx.texture_sizes.get(t)) for t in textures.values())
+    return hashlib.md5(json.dumps([textures, sizes], sort_keys=True)).hexdigest()
+
+
+def load_shared_assets(path):
+    '''--shared-assets: the textures of the sprite frames emitted by the last
+       creator_assets.cpp, and their sizes. With --pack-atlas they are its
+       atlas pages. Saved in the build manifest by run_shared_assets()
+    '''
+    shared = load_manifest(get_manifest_filename(path)).get('shared_assets', {})
+    g_ctx.sprite_frame_textures = shared.get('sprite_frame_textures', {})
+    g_ctx.texture_sizes = dict((t, tuple(size)) for t, size in shared.get('texture_sizes', {}).items())
+
+
+def add_dependency(filename):
+    '''records a file (relative to g_ctx.path) read while generating the
+       scene, that is not resolved from a uuid. See get_scene_dependencies()
+    '''
+    g_ctx.read_files.add(os.path.normpath(filename))
+
+
+def get_scene_dependencies(path):
+    '''files (and their .meta) resolved so far by the scene, and the other
+       files it read. The ones that don't exist (yet) are skipped
+    '''
+    filenames = [g_ctx.uuid[uuid]['relativePath'] for uuid in g_ctx.resolved_uuids if uuid in g_ctx.uuid]
+    deps = {}
+    for filename in filenames + sorted(g_ctx.read_files):
+        filename = os.path.join(path, filename)
+        for dep in (filename, filename + '.meta'):
+            if os.path.isfile(dep):
+                deps[dep] = get_file_hash(dep)
+    return deps
+
+
+def scene_is_up_to_date(entry, filename, settings):
+    if entry is None or entry['settings'] != settings:
+        return False
+    for output in entry['outputs']:
+        if not os.path.exists(output):
+            return False
+    if entry['fire'] != get_file_hash(filename):
+        return False
+    for dep in entry['deps']:
+        if not os.path.isfile(dep) or entry['deps'][dep] != get_file_hash(dep):
+            return False
+    return entry['sprite_frames'] == get_sprite_frames_digest(entry['sprite_frame_uuids'])
 
-    global g_json_data
-    with open(filename) as data_file:
-        g_json_data = json.load(data_file)
-
-    print("total elements: %d" % len(g_json_data))
-    for i,obj in enumerate(g_json_data):
-        if obj["__type__"] == "cc.SceneAsset":
-            scenes = obj["scene"]
-            scene_idx = scenes["__id__"]
-            scene_obj = Scene(g_json_data[scene_idx])
-            scene_obj.parse_properties()
-#            scene_obj.print_scene_graph(0)
-
-            # cpp file
-            g_file_cpp.write("////// AUTOGENERATED:BEGIN //////\n")
-            g_file_cpp.write("////// DO     NOT     EDIT //////\n")
-            g_file_cpp.write("\n#include <ui/CocosGUI.h>\n")
-            g_file_cpp.write('#include "creator_utils.h"\n')
-            to_cpp_setup()
-            g_file_cpp.write("Node* %s_create()\n{\n" % g_filename)
-            scene_obj.to_cpp(None,0,0)
-            g_file_cpp.write("    return scene_0;\n}\n")
-            g_file_cpp.write("////// AUTOGENERATED:END//////\n")
-
-            # header file
-            header = """
+
+################################################################################
+#
+# Preloading
+# <scene>_preload() loads the textures of the scene with addImageAsync()
+#
+################################################################################
+RESOURCE_TYPES = (('.png', 'texture'), ('.jpg', 'texture'), ('.jpeg', 'texture'),
+        ('.ttf', 'font'), ('.fnt', 'font'), ('.tmx', 'tmx'), ('.plist', 'plist'))
+
+
+def get_resource_type(filename):
+    for extension, resource_type in RESOURCE_TYPES:
+        if filename.lower().endswith(extension):
+            return resource_type
+    return 'file'
+
+
+def get_resource_textures(filename):
+    '''textures loaded by a .fnt, .tmx or particle .plist (relative to g_ctx.path)'''
+    textures = []
+    add_dependency(filename)
+    try:
+        fullpath = os.path.join(g_ctx.path, filename)
+        if filename.endswith('.fnt'):
+            with open(fullpath) as fd:
+                for line in fd:
+                    if line.startswith('page ') and 'file="' in line:
+                        textures.append(line.split('file="')[1].split('"')[0])
+        elif filename.endswith('.tmx'):
+            textures = [image.get('source') for image in ElementTree.parse(fullpath).iter('image')]
+        elif filename.endswith('.plist'):
+            plist = plistlib.readPlist(fullpath)
+            if plist.get('textureFileName'):
+                textures.append(plist['textureFileName'])
+    except Exception as e:
+        logger.warning("Can't read the textures of %s (%s)", filename, e)
+    textures = [os.path.normpath(os.path.join(os.path.dirname(filename), t)) for t in textures]
+    for t in textures:
+        add_dependency(t)
+    # particles can embed their texture instead
+    return [t for t in textures if os.path.isfile(os.path.join(g_ctx.path, t))]
+
+
+def get_resource_size(filename):
+    '''size of a resource in bytes. None if it is not found'''
+    fullpath = os.path.join(g_ctx.path, filename)
+    if os.path.isfile(fullpath):
+        return os.path.getsize(fullpath)
+    for page in g_ctx.atlas_pages:
+        if os.path.basename(page.filename) == filename:
+            return len(page.getvalue())
+    return None
+
+
+def get_scene_resources(scene_obj):
+    '''[(type, filename)] of the files loaded by the scene, sorted'''
+    files = set()
+    scene_obj.collect_resource_files(files)
+
+    textures = set(g_ctx.sprite_frame_textures.values())
+    if g_ctx.options.get('shared_assets'):
+        # the sprite frames are emitted by creator_assets.cpp
+        textures = set(get_shared_sprite_frame_textures(g_ctx.used_sprite_frames).values())
+    for filename in files:
+        textures.update(get_resource_textures(filename))
+
+    resources = [(get_resource_type(f), f) for f in files]
+    resources.extend(('texture', t) for t in textures)
+    return sorted(set(resources))
+
+
+def to_cpp_preload(scene_obj):
+    '''emits <scene>_preload(callback): loads the textures of the scene in
+       the background, and calls callback once they are in the TextureCache
+    '''
+    g_ctx.scene_resources = get_scene_resources(scene_obj)
+    textures = [f for t, f in g_ctx.scene_resources if t == 'texture']
+
+    g_ctx.cpp.write("void %s_preload(const std::function<void()>& callback)\n{\n" % g_ctx.filename)
+    if not textures:
+        g_ctx.cpp.write("    if (callback)\n        callback();\n}\n")
+        return
+    g_ctx.cpp.write("    static const char* textures[] = {\n")
+    for texture in textures:
+        g_ctx.cpp.write('        "%s",\n' % (g_ctx.assetpath + texture))
+    g_ctx.cpp.write("""    };
+    auto remaining = std::make_shared<int>(%d);
+    auto textureCache = Director::getInstance()->getTextureCache();
+    for (auto texture : textures) {
+        textureCache->addImageAsync(texture, [remaining, callback](Texture2D*) {
+            if (--*remaining == 0 && callback)
+                callback();
+        });
+    }
+}
+""" % len(textures))
+
+
+def to_resource_manifest():
+    '''emitter of cpp/<scene>_resources.json: the files loaded by the
+       scene, with their sizes
+    '''
+    resources = []
+    total_size = 0
+    for resource_type, filename in g_ctx.scene_resources:
+        size = get_resource_size(filename)
+        total_size += size or 0
+        resources.append({'type': resource_type, 'file': g_ctx.assetpath + filename, 'size': size})
+    emitter = Emitter('cpp/%s_resources.json' % g_ctx.filename)
+    emitter.write(json.dumps({'scene': g_ctx.filename, 'resources': resources, 'total_size': total_size},
+        indent=2, sort_keys=True, separators=(',', ': ')) + '\n')
+    return emitter
+
+
+################################################################################
+#
+# Draw calls (--reorder-siblings)
+# Estimates the draw calls of a scene, and reorders the siblings so that the
+# quads of the same texture are drawn one after the other and get batched
+#
+################################################################################
+# groups with more siblings are left as they are
+REORDER_MAX_SIBLINGS = 256
+
+# in the draw keys: the batching stops there
+DRAW_BARRIER = 'barrier'
+
+
+def get_sprite_frame_texture(uuid):
+    '''texture of a sprite frame in the generated code. None if unknown'''
+    if uuid in g_ctx.sprite_frame_textures:
+        return g_ctx.sprite_frame_textures[uuid]
+    if uuid not in g_ctx.sprite_frames:
+        return None
+    return get_sprite_frame_texture_file(g_ctx.sprite_frames[uuid])
+
+
+def get_local_z_order(node):
+    return node._properties.get('setLocalZOrder', 0)
+
+
+def get_node_box(node, box=None):
+    '''(x0, y0, x1, y1): box, in the space of node (its content by
+       default), transformed to the space of its parent. Ignores the
+       rotation and the skew
+    '''
+    pos = node._properties.get('setPosition', Vec2(0, 0))
+    size = node._properties.get('setContentSize', Size(0, 0))
+    anchor = node._properties.get('setAnchorPoint', node.CPP_DEFAULTS.get('setAnchorPoint', Vec2(0, 0)))
+    scale_x = node._properties.get('setScaleX', 1)
+    scale_y = node._properties.get('setScaleY', 1)
+    if box is None:
+        box = (0, 0, size.width, size.height)
+    xs = [pos.x + (x - anchor.x * size.width) * scale_x for x in (box[0], box[2])]
+    ys = [pos.y + (y - anchor.y * size.height) * scale_y for y in (box[1], box[3])]
+    return (min(xs), min(ys), max(xs), max(ys))
+
+
+def get_subtree_boxes(root):
+    '''{node: box of the node and its descendants, in the space of its
+       parent}. None if it can't be known: rotation, skew, global z order,
+       nodes that draw out of their content size
+    '''
+    nodes = []
+    def visit(node, parent, depth, sibling_idx):
+        nodes.append(node)
+        return node
+    walk_tree(root, visit)
+
+    boxes = {}
+    # the children before their parent
+    for node in reversed(nodes):
+        p = node._properties
+        box = None
+        if node.BOUNDED and not any(p.get(k, 0) for k in ('setRotationSkewX', 'setRotationSkewY', 'setSkewX', 'setSkewY', 'setGlobalZOrder')):
+            size = p.get('setContentSize', Size(0, 0))
+            x0, y0, x1, y1 = 0, 0, size.width, size.height
+            for child in node._children:
+                child_box = boxes[child]
+                if child_box is None:
+                    break
+                x0, y0 = min(x0, child_box[0]), min(y0, child_box[1])
+                x1, y1 = max(x1, child_box[2]), max(y1, child_box[3])
+            else:
+                box = get_node_box(node, (x0, y0, x1, y1))
+        boxes[node] = box
+    return boxes
+
+
+def boxes_overlap(a, b):
+    if a is None or b is None:
+        return True
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+
+def get_render_order(root):
+    '''root and its emitted descendants in the order of the renderer: by
+       local z order, then in the order they were added, with the parent
+       after its children of negative z order. DRAW_BARRIER where the
+       batching stops
+    '''
+    order = []
+    # (True, node to walk) or (False, node or DRAW_BARRIER drawn there)
+    stack = [(True, root)]
+    while stack:
+        is_node, item = stack.pop()
+        if not is_node:
+            order.append(item)
+            continue
+        if not item.is_emitted():
+            continue
+        children = sorted(item._children, key=get_local_z_order)
+        negative = [(True, c) for c in children if get_local_z_order(c) < 0]
+        positive = [(True, c) for c in children[len(negative):]]
+        sequence = negative + [(False, item)] + positive
+        if item.clips_children() and children:
+            sequence = [(False, DRAW_BARRIER)] + sequence + [(False, DRAW_BARRIER)]
+        stack.extend(reversed(sequence))
+    return order
+
+
+def get_draw_keys(root):
+    '''draw keys (see Node.get_draw_key()) of root and its descendants, in
+       the order of the renderer (see get_render_order())
+    '''
+    keys = []
+    for item in get_render_order(root):
+        key = item if item == DRAW_BARRIER else item.get_draw_key()
+        if key is not None:
+            keys.append(key)
+    return keys
+
+
+def count_draw_calls(keys):
+    '''consecutive quads of the same texture are batched in one draw call'''
+    calls = 0
+    last = None
+    for key in keys:
+        if key == DRAW_BARRIER:
+            last = None
+        elif key != last or isinstance(key, Node):
+            calls += 1
+            last = key
+    return calls
+
+
+def count_texture_switches(keys):
+    '''times the renderer binds another texture. The nodes drawn on their
+       own (labels, particles...) have a texture of their own
+    '''
+    switches = 0
+    last = None
+    for key in keys:
+        if key == DRAW_BARRIER:
+            continue
+        if last is not None and (key != last or isinstance(key, Node)):
+            switches += 1
+        last = key
+    return switches
+
+
+def estimate_draw_calls(scene_obj):
+    return count_draw_calls(get_draw_keys(scene_obj))
+
+
+def reorder_group(group, boxes, keys):
+    '''group: siblings of the same local z order, in the order they are
+       added. Returns them in an order that draws the same thing, preferring
+       the sibling that starts with the texture the previous one ended with.
+       A sibling never moves before an earlier one it overlaps
+    '''
+    blockers = dict((node, 0) for node in group)
+    blocked = dict((node, []) for node in group)
+    for i, node in enumerate(group):
+        for earlier in group[:i]:
+            if boxes_overlap(boxes[earlier], boxes[node]):
+                blockers[node] += 1
+                blocked[earlier].append(node)
+
+    result = []
+    last = None
+    remaining = list(group)
+    while remaining:
+        ready = [node for node in remaining if blockers[node] == 0]
+        pick = ready[0]
+        if last is not None:
+            for node in ready:
+                if keys[node] and keys[node][0] == last:
+                    pick = node
+                    break
+        remaining.remove(pick)
+        result.append(pick)
+        for node in blocked[pick]:
+            blockers[node] -= 1
+        if keys[pick]:
+            last = keys[pick][-1]
+            if last == DRAW_BARRIER or isinstance(last, Node):
+                last = None
+    return result
+
+
+def reorder_siblings(scene_obj):
+    '''--reorder-siblings: reorders the children of each node to batch the
+       quads of the same texture, without changing what is drawn. A parent
+       keeps its order if the new one doesn't save draw calls
+    '''
+    boxes = get_subtree_boxes(scene_obj)
+    nodes = []
+    def visit(node, parent, depth, sibling_idx):
+        if node.is_emitted():
+            nodes.append(node)
+            return node
+    walk_tree(scene_obj, visit)
+
+    # the children before their parent: their own order is already final
+    for node in reversed(nodes):
+        children = list(node._children)
+        if len(children) < 2 or node.is_virtualized():
+            continue
+        keys = dict((child, get_draw_keys(child)) for child in children)
+        reordered = list(children)
+        for z in sorted(set(get_local_z_order(c) for c in children)):
+            slots = [i for i, c in enumerate(children) if get_local_z_order(c) == z]
+            if 2 <= len(slots) <= REORDER_MAX_SIBLINGS:
+                group = reorder_group([children[i] for i in slots], boxes, keys)
+                for i, child in zip(slots, group):
+                    reordered[i] = child
+        if reordered != children:
+            before = count_draw_calls(get_draw_keys(node))
+            node._children = tuple(reordered)
+            if count_draw_calls(get_draw_keys(node)) >= before:
+                node._children = tuple(children)
+
+
+################################################################################
+#
+# Performance report (--report)
+# cpp/<scene>_report.json: what the scene costs at runtime, estimated from the
+# parsed tree and the sprite frame tables
+#
+################################################################################
+# sprites covering more than this part of the design resolution are large
+OVERDRAW_MIN_AREA = 0.25
+
+# the design resolution of the scenes without a Canvas (the Creator default)
+DEFAULT_DESIGN_RESOLUTION = {'width': 960, 'height': 640}
+
+# Texture2D::PixelFormat::RGBA8888, the default
+TEXTURE_BYTES_PER_PIXEL = 4
+
+
+def get_texture_size(filename):
+    '''(width, height) of a texture in pixels. None if unknown'''
+    if filename in g_ctx.texture_sizes:
+        return g_ctx.texture_sizes[filename]
+    if Image is not None:
+        add_dependency(filename)
+        try:
+            # only reads the header
+            return Image.open(os.path.join(g_ctx.path, filename)).size
+        except Exception as e:
+            logger.debug("Can't read the size of %s (%s)", filename, e)
+    return None
+
+
+def get_scene_layout(scene_obj):
+    '''{node: (path, box in the space of the scene, opacity)} of the emitted
+       nodes. The box is None if a rotation or a skew is in the way, the
+       opacity cascades like in the engine
+    '''
+    layout = {}
+    def visit(node, parent, depth, sibling_idx):
+        if not node.is_emitted():
+            return None
+        parent_path, transform, parent_opacity, cascade = parent
+        p = node._properties
+        name = p['setName'].value if 'setName' in p else ''
+        name = name or node.get_class_name()
+        path = '%s/%s' % (parent_path, name) if parent_path else name
+
+        if transform is not None and not any(p.get(k, 0) for k in ('setRotationSkewX', 'setRotationSkewY', 'setSkewX', 'setSkewY')):
+            # (x, y) in the space of node -> (a * x + b, c * y + d) in the space of the scene
+            a, b, c, d = transform
+            pos = p.get('setPosition', Vec2(0, 0))
+            size = p.get('setContentSize', Size(0, 0))
+            anchor = p.get('setAnchorPoint', node.CPP_DEFAULTS.get('setAnchorPoint', Vec2(0, 0)))
+            scale_x = p.get('setScaleX', 1)
+            scale_y = p.get('setScaleY', 1)
+            transform = (a * scale_x, a * (pos.x - anchor.x * size.width * scale_x) + b,
+                         c * scale_y, c * (pos.y - anchor.y * size.height * scale_y) + d)
+            a, b, c, d = transform
+            xs = (b, a * size.width + b)
+            ys = (d, c * size.height + d)
+            box = (min(xs), min(ys), max(xs), max(ys))
+        else:
+            transform = None
+            box = None
+
+        opacity = p.get('setOpacity', 255)
+        if cascade:
+            opacity = opacity * parent_opacity / 255
+        layout[node] = (path, box, opacity)
+        cascade = p.get('setCascadeOpacityEnabled', node.CPP_DEFAULTS.get('setCascadeOpacityEnabled', False))
+        return (path, transform, opacity, cascade)
+    walk_tree(scene_obj, visit, ('', (1, 0, 1, 0), 255, False))
+    return layout
+
+
+def get_overdraw(scene_obj, layout):
+    '''large sprites of full opacity drawn over each other: [{node, covers, area}]'''
+    resolution = g_ctx.design_resolution or DEFAULT_DESIGN_RESOLUTION
+    min_area = resolution['width'] * resolution['height'] * OVERDRAW_MIN_AREA
+    large = []
+    for node in get_render_order(scene_obj):
+        if not isinstance(node, Sprite):
+            continue
+        path, box, opacity = layout[node]
+        if box is not None and opacity >= 255 and (box[2] - box[0]) * (box[3] - box[1]) >= min_area:
+            large.append((path, box))
+
+    overdraw = []
+    for i, (path, box) in enumerate(large):
+        for covered_path, covered in large[:i]:
+            w = min(box[2], covered[2]) - max(box[0], covered[0])
+            h = min(box[3], covered[3]) - max(box[1], covered[1])
+            if w > 0 and h > 0:
+                overdraw.append({'node': path, 'covers': covered_path, 'area': round(w * h, 1)})
+    return overdraw
+
+
+def get_scene_report(scene_obj):
+    '''--report of scene_obj. Called once its sprite frames and resources
+       are known
+    '''
+    layout = get_scene_layout(scene_obj)
+    keys = get_draw_keys(scene_obj)
+
+    textures = []
+    texture_memory = 0
+    for resource_type, filename in g_ctx.scene_resources:
+        if resource_type != 'texture':
+            continue
+        size = get_texture_size(filename)
+        texture = {'file': g_ctx.assetpath + filename, 'width': None, 'height': None, 'bytes': None}
+        if size is not None:
+            texture.update(width=size[0], height=size[1], bytes=size[0] * size[1] * TEXTURE_BYTES_PER_PIXEL)
+            texture_memory += texture['bytes']
+        textures.append(texture)
+
+    system_font_labels = []
+    for node in get_render_order(scene_obj):
+        if isinstance(node, Label) and node._font_type == Label.FONT_SYSTEM:
+            system_font_labels.append({'node': layout[node][0], 'text': node._label_text.replace('\\n', '\n'), 'size': node._font_size})
+
+    report = {'scene': g_ctx.filename,
+              'nodes': len(layout),
+              'draw_calls': g_ctx.draw_calls[1],
+              'texture_switches': count_texture_switches(keys),
+              'textures': textures,
+              'texture_memory': texture_memory,
+              'overdraw': get_overdraw(scene_obj, layout),
+              'dropped_nodes': g_ctx.dropped_nodes,
+              'system_font_labels': system_font_labels}
+    if g_ctx.options.get('reorder_siblings'):
+        report['draw_calls_without_reordering'] = g_ctx.draw_calls[0]
+    return report
+
+
+def to_scene_report():
+    '''emitter of cpp/<scene>_report.json'''
+    emitter = Emitter('cpp/%s_report.json' % g_ctx.filename)
+    emitter.write(json.dumps(g_ctx.scene_report, indent=2, sort_keys=True, separators=(',', ': ')) + '\n')
+    return emitter
+
+
+################################################################################
+#
+# Virtualized ScrollViews (--virtual-scrollviews)
+# Only the items that intersect the view are created, and their nodes reused
+#
+################################################################################
+def get_item_layout(item):
+    '''(x, y, left, bottom, width, height): position and bounding box of
+       the item, in the inner container. The position was already adjusted
+       by ScrollView.adjust_child_parameters(). The box ignores the rotation
+       and the children of the item
+    '''
+    pos = item._properties['setPosition']
+    x0, y0, x1, y1 = get_node_box(item)
+    return (pos.x, pos.y, x0, y0, x1 - x0, y1 - y0)
+
+
+def to_cpp_item_factory(item, exclude):
+    '''(code, names, strings): code creating item and its children, with the
+       same variable names for identical items. It skips the properties of
+       item in `exclude`, the names of the nodes and the strings of the
+       labels: it adds those nodes to `bound` instead, and names and strings
+       are their values for this item
+    '''
+    cpp, unique_id, options = g_ctx.cpp, g_ctx.unique_id, g_ctx.options
+    chunk_first_id = g_ctx.chunk_first_id
+    g_ctx.cpp = Emitter(None)
+    g_ctx.unique_id = 0
+    g_ctx.chunk_first_id = 0
+    # a factory is a single function
+    g_ctx.options = dict((k, v) for k, v in options.items() if k != 'time_sliced')
+    g_ctx.item_factory = {'item': item, 'exclude': exclude, 'names': [], 'strings': []}
+    try:
+        item.to_cpp(None, 0, 0)
+        return g_ctx.cpp.getvalue(), g_ctx.item_factory['names'], g_ctx.item_factory['strings']
+    finally:
+        g_ctx.cpp, g_ctx.unique_id, g_ctx.options = cpp, unique_id, options
+        g_ctx.chunk_first_id = chunk_first_id
+        g_ctx.item_factory = None
+
+
+def to_cpp_virtual_lists(scene_obj):
+    '''emits the item factories of the virtualized ScrollViews, before the
+       code that creates the scene
+    '''
+    lists = []
+    def visit(node, parent, depth, sibling_idx):
+        if node.is_emitted():
+            if node.is_virtualized():
+                lists.append(node)
+            return node
+    walk_tree(scene_obj, visit)
+    # the innermost first: the factories of the outer ones use them
+    for scroll_view in reversed(lists):
+        scroll_view.to_cpp_virtual_list()
+
+
+def to_virtual_list_helper():
+    '''emitters of creator_virtual_list.h/.cpp, the runtime side of
+       --virtual-scrollviews
+    '''
+    helper_h = Emitter('cpp/creator_virtual_list.h')
+    helper_h.write(VIRTUAL_LIST_H)
+    helper_cpp = Emitter('cpp/creator_virtual_list.cpp')
+    helper_cpp.write(VIRTUAL_LIST_CPP)
+    return [helper_h, helper_cpp]
+
+
+VIRTUAL_LIST_H = """////// AUTOGENERATED:BEGIN //////
+////// DO     NOT     EDIT //////
+#pragma once
+
+#include <ui/CocosGUI.h>
+
+// an item of a virtualized ScrollView
+struct CreatorListItem
+{
+    // index of the factory that creates it
+    int factory;
+    // position, and bounding box, in the inner container
+    float x, y;
+    float left, bottom, width, height;
+    // values of the nodes that the factory bound (see CreatorListItemNodes)
+    const char* const* names;
+    const char* const* strings;
+};
+
+// the nodes of an item whose name, or string, depends on the item. The
+// factories fill it, and it is the user object of the node they return
+struct CreatorListItemNodes : public cocos2d::Ref
+{
+    cocos2d::Vector<cocos2d::Node*> named;
+    cocos2d::Vector<cocos2d::Label*> labels;
+};
+
+typedef cocos2d::Node* (*CreatorListItemFactory)(CreatorListItemNodes* bound);
+
+// keeps in the inner container of scrollView only the items that intersect
+// its view. The nodes of the other ones are kept aside and reused for the next
+// item made by the same factory: there are no more nodes than the items in
+// the view at once. items and factories are not copied
+void creator_virtualize_scrollview(cocos2d::ui::ScrollView* scrollView, const CreatorListItem* items, int count,
+        const CreatorListItemFactory* factories, int factoryCount);
+
+////// AUTOGENERATED:END//////
+"""
+
+VIRTUAL_LIST_CPP = """////// AUTOGENERATED:BEGIN //////
+////// DO     NOT     EDIT //////
+
+#include "creator_virtual_list.h"
+
+USING_NS_CC;
+
+namespace {
+
+struct VirtualList
+{
+    const CreatorListItem* items;
+    int count;
+    const CreatorListItemFactory* factories;
+    // node of each item, nullptr while it is out of the view
+    std::vector<Node*> nodes;
+    // nodes that can be reused, by factory
+    std::vector<Vector<Node*>> pools;
+    // view of the last update
+    bool updated;
+    Vec2 position;
+    Size size;
+};
+
+void update_items(ui::ScrollView* scrollView, VirtualList* list)
+{
+    auto inner = scrollView->getInnerContainer();
+    auto position = inner->getPosition();
+    auto size = scrollView->getContentSize();
+    if (list->updated && position.equals(list->position) && size.equals(list->size))
+        return;
+    list->updated = true;
+    list->position = position;
+    list->size = size;
+
+    // the view, in the coordinates of the inner container
+    auto innerSize = inner->getContentSize();
+    auto anchor = inner->getAnchorPoint();
+    Rect view(anchor.x * innerSize.width - position.x, anchor.y * innerSize.height - position.y, size.width, size.height);
+
+    // recycles the items that left the view before creating the new ones
+    std::vector<int> shown;
+    for (int i = 0; i < list->count; i++) {
+        auto& item = list->items[i];
+        bool visible = view.intersectsRect(Rect(item.left, item.bottom, item.width, item.height));
+        if (!visible && list->nodes[i]) {
+            list->pools[item.factory].pushBack(list->nodes[i]);
+            list->nodes[i]->removeFromParent();
+            list->nodes[i] = nullptr;
+        } else if (visible && !list->nodes[i]) {
+            shown.push_back(i);
+        }
+    }
+    for (auto i : shown) {
+        auto& item = list->items[i];
+        auto& pool = list->pools[item.factory];
+        Node* node;
+        if (pool.empty()) {
+            auto bound = new CreatorListItemNodes();
+            node = list->factories[item.factory](bound);
+            node->setUserObject(bound);
+            bound->release();
+            inner->addChild(node);
+        } else {
+            node = pool.back();
+            inner->addChild(node);
+            pool.popBack();
+        }
+        node->setPosition(item.x, item.y);
+        auto bound = static_cast<CreatorListItemNodes*>(node->getUserObject());
+        for (ssize_t j = 0; j < bound->named.size(); j++)
+            bound->named.at(j)->setName(item.names[j]);
+        for (ssize_t j = 0; j < bound->labels.size(); j++)
+            bound->labels.at(j)->setString(item.strings[j]);
+        list->nodes[i] = node;
+    }
+}
+
+}
+
+void creator_virtualize_scrollview(ui::ScrollView* scrollView, const CreatorListItem* items, int count,
+        const CreatorListItemFactory* factories, int factoryCount)
+{
+    auto list = std::make_shared<VirtualList>();
+    list->items = items;
+    list->count = count;
+    list->factories = factories;
+    list->nodes.resize(count, nullptr);
+    list->pools.resize(factoryCount);
+    list->updated = false;
+    update_items(scrollView, list.get());
+    scrollView->schedule([scrollView, list](float) {
+        update_items(scrollView, list.get());
+    }, "creator_virtual_list");
+}
+
+////// AUTOGENERATED:END//////
+"""
+
+
+################################################################################
+#
+# Time-sliced construction (--time-sliced)
+# The nodes are created by chunks of N nodes, a few chunks per frame
+#
+################################################################################
+TIME_SLICED_CPP = """
+Node* %(name)s_create()
+{
+    std::vector<Node*> nodes(%(nodes)d);
+    for (auto chunk : %(name)s_chunks)
+        chunk(nodes.data());
+    return nodes[0];
+}
+
+void %(name)s_create_async(const std::function<void(Node*)>& callback, float budget)
+{
+    // the nodes created so far. The root is retained until the last chunk,
+    // the other nodes by their parent
+    auto nodes = std::make_shared<std::vector<Node*>>(%(nodes)d);
+    auto next = std::make_shared<size_t>(0);
+    auto scheduler = Director::getInstance()->getScheduler();
+    scheduler->schedule([=](float) {
+        const size_t count = sizeof(%(name)s_chunks) / sizeof(%(name)s_chunks[0]);
+        auto start = std::chrono::steady_clock::now();
+        do {
+            %(name)s_chunks[*next](nodes->data());
+            if (*next == 0)
+                (*nodes)[0]->retain();
+            ++*next;
+        } while (*next < count && std::chrono::duration<float>(std::chrono::steady_clock::now() - start).count() < budget);
+
+        if (*next == count) {
+            auto root = (*nodes)[0];
+            auto done = callback;
+            scheduler->unschedule("%(name)s_create_async", nodes.get());
+            root->autorelease();
+            if (done)
+                done(root);
+        }
+    }, nodes.get(), 0, false, "%(name)s_create_async");
+}
+"""
+
+
+def to_cpp_next_chunk():
+    '''ends the current chunk function and starts the next one'''
+    g_ctx.cpp.write("}\n\nstatic void %s_chunk%d(Node** nodes)\n{\n" % (g_ctx.filename, g_ctx.chunk_count))
+    g_ctx.chunk_count += 1
+    g_ctx.chunk_first_id = g_ctx.unique_id
+
+
+def to_cpp_time_sliced(scene_obj):
+    '''emits the nodes of scene_obj in <scene>_chunk<n>() functions that
+       create --time-sliced nodes each, in the usual order. <scene>_create()
+       calls all of them, <scene>_create_async() as many as fit in the
+       budget of each frame
+    '''
+    g_ctx.chunk_count = 1
+    g_ctx.chunk_first_id = g_ctx.unique_id
+    g_ctx.cpp.write("static void %s_chunk0(Node** nodes)\n{\n" % g_ctx.filename)
+    scene_obj.to_cpp(None,0,0)
+    g_ctx.cpp.write("}\n\nstatic void (*const %s_chunks[])(Node**) = {\n" % g_ctx.filename)
+    for i in range(g_ctx.chunk_count):
+        g_ctx.cpp.write("    %s_chunk%d,\n" % (g_ctx.filename, i))
+    g_ctx.cpp.write("};\n")
+    g_ctx.cpp.write(TIME_SLICED_CPP % {'name': g_ctx.filename, 'nodes': g_ctx.unique_id})
+
+
+def to_cpp_scene(scene_obj, bin_emitter=None):
+    '''emits the .cpp and .h of scene_obj. With --binary, the nodes go to
+       bin_emitter and <scene>_create() loads them
+    '''
+    # cpp file
+    g_ctx.cpp.write("////// AUTOGENERATED:BEGIN //////\n")
+    g_ctx.cpp.write("////// DO     NOT     EDIT //////\n")
+    g_ctx.cpp.write("\n#include <ui/CocosGUI.h>\n")
+    g_ctx.cpp.write('#include "creator_utils.h"\n')
+    if g_ctx.options.get('time_sliced'):
+        g_ctx.cpp.write('#include <chrono>\n')
+    if g_ctx.options.get('virtual_scrollviews'):
+        g_ctx.cpp.write('#include "creator_virtual_list.h"\n')
+    if bin_emitter is not None:
+        g_ctx.cpp.write('#include "creator_scene_loader.h"\n')
+    if g_ctx.options.get('shared_assets'):
+        g_ctx.cpp.write('#include "creator_assets.h"\n')
+    to_cpp_setup(scene_obj)
+    # the textures of the sprite frames are known once they are emitted
+    draw_calls = estimate_draw_calls(scene_obj)
+    if g_ctx.options.get('reorder_siblings'):
+        reorder_siblings(scene_obj)
+    g_ctx.draw_calls = (draw_calls, estimate_draw_calls(scene_obj))
+    to_cpp_preload(scene_obj)
+    if g_ctx.options.get('report'):
+        g_ctx.scene_report = get_scene_report(scene_obj)
+    if g_ctx.options.get('virtual_scrollviews'):
+        to_cpp_virtual_lists(scene_obj)
+    if bin_emitter is not None:
+        g_ctx.cpp.write("Node* %s_create()\n{\n" % g_ctx.filename)
+        writer = BinarySceneWriter()
+        scene_obj.to_binary(writer, -1)
+        bin_emitter.write(writer.getvalue())
+        g_ctx.cpp.write('    return creator_load_scene("%s%s");\n}\n' % (g_ctx.assetpath, os.path.basename(bin_emitter.filename)))
+    elif g_ctx.options.get('time_sliced'):
+        to_cpp_time_sliced(scene_obj)
+    else:
+        g_ctx.cpp.write("Node* %s_create()\n{\n" % g_ctx.filename)
+        scene_obj.to_cpp(None,0,0)
+        g_ctx.cpp.write("    return scene_0;\n}\n")
+    g_ctx.cpp.write("////// AUTOGENERATED:END//////\n")
+
+    # header file
+    create_async = ""
+    if g_ctx.options.get('time_sliced'):
+        create_async = """// creates the scene over several frames, spending about `budget` seconds
+// in each one, then calls callback with it
+void %s_create_async(const std::function<void(cocos2d::Node*)>& callback, float budget = 0.004f);
+""" % g_ctx.filename
+    header = """
 ////// AUTOGENERATED:BEGIN //////
 ////// DO     NOT     EDIT //////
 #pragma once
@@ -945,16 +3626,353 @@ def run(filename, assetpath):
 #include <cocos2d.h>
 
 bool %s_init();
+// loads the textures of the scene in the background. Call it before %s_init()
+void %s_preload(const std::function<void()>& callback);
 cocos2d::Node* %s_create();
-
+%s
 ////// AUTOGENERATED:END//////
-""" % (g_filename, g_filename)
-            g_file_h.write(header)
+""" % (g_ctx.filename, g_ctx.filename, g_ctx.filename, g_ctx.filename, create_async)
+    g_ctx.h.write(header)
+
+
+def run(filename, assetpath, settings=None, options=None):
+    '''converts filename. Returns its entry for the build manifest'''
+    globals_init()
+
+    g_ctx.assetpath = assetpath
+    if options is not None:
+        g_ctx.options = options
+    g_ctx.filename = os.path.splitext(os.path.basename(filename))[0]
+    cpp_name = "cpp/%s.cpp" % g_ctx.filename
+    h_name = "cpp/%s.h" % g_ctx.filename
+
+    # files are written at the end, and only if their content changed
+    g_ctx.cpp = Emitter(cpp_name)
+    g_ctx.h = Emitter(h_name)
+
+    path = os.path.dirname(filename)
+    g_ctx.path = path
+    populate_asset_tables(path)
+    if g_ctx.options.get('shared_assets'):
+        load_shared_assets(path)
+    deps = {}
+
+    with phase('load'):
+        g_ctx.json_data = load_fire_file(filename)
+        build_component_index()
+
+    logger.info("%s: total elements: %d", filename, len(g_ctx.json_data))
+    scene_objs = []
+    with phase('parse'):
+        for i,obj in enumerate(g_ctx.json_data):
+            if obj["__type__"] == "cc.SceneAsset":
+                scenes = obj["scene"]
+                scene_idx = scenes["__id__"]
+                scene_obj = Scene(scene_idx)
+                scene_obj.parse_tree()
+#                scene_obj.print_scene_graph(0)
+                deps.update(get_scene_dependencies(path))
+                scene_objs.append(scene_obj)
+
+        if not g_ctx.options.get('all_sprite_frames'):
+            g_ctx.used_sprite_frames = set()
+            for scene_obj in scene_objs:
+                scene_obj.collect_sprite_frames(g_ctx.used_sprite_frames)
+
+    # the parsed nodes keep what they need
+    if g_ctx.options.get('low_memory'):
+        g_ctx.json_data = None
+        g_ctx.components = None
+
+    emitters = [g_ctx.cpp, g_ctx.h]
+    bin_emitter = None
+    if g_ctx.options.get('binary'):
+        bin_emitter = Emitter("cpp/%s.bin" % g_ctx.filename, binary=True)
+        emitters.append(bin_emitter)
+        emitters.extend(to_binary_loader())
+    if g_ctx.options.get('virtual_scrollviews'):
+        emitters.extend(to_virtual_list_helper())
+
+    with phase('emit'):
+        for scene_obj in scene_objs:
+            to_cpp_scene(scene_obj, bin_emitter)
+
+    emitters.extend(g_ctx.atlas_pages)
+    emitters.append(to_resource_manifest())
+    if g_ctx.options.get('report'):
+        emitters.append(to_scene_report())
+    with phase('write'):
+        for emitter in emitters:
+            if not emitter.commit():
+                logger.info("%s: unchanged", emitter.filename)
+
+    # the textures resolved while emitting the sprite frames
+    deps.update(get_scene_dependencies(path))
+
+    logger.info("%s: %d property setters, %d elided (engine defaults)", filename, g_ctx.emitted_properties, g_ctx.elided_properties)
+    if g_ctx.options.get('reorder_siblings'):
+        logger.info("%s: ~%d draw calls (~%d before reordering the siblings)", filename, g_ctx.draw_calls[1], g_ctx.draw_calls[0])
+    else:
+        logger.info("%s: ~%d draw calls", filename, g_ctx.draw_calls[0])
+
+    peak = get_peak_memory()
+    if peak is not None:
+        logger.info("%s: peak memory %.1f MB", filename, peak / (1024 * 1024))
+
+    if g_ctx.options.get('profile'):
+        print_profile(filename, emitters)
+
+    if settings is None:
+        settings = get_build_settings(assetpath, g_ctx.options)
+    used_sprite_frames = None
+    if g_ctx.used_sprite_frames is not None:
+        used_sprite_frames = sorted(g_ctx.used_sprite_frames)
+    shared_assets = None
+    if g_ctx.options.get('shared_assets'):
+        shared_assets = get_shared_assets_digest(used_sprite_frames)
+    return {'settings': settings,
+            'fire': get_file_hash(filename),
+            'deps': deps,
+            'sprite_frames': get_sprite_frames_digest(used_sprite_frames),
+            'sprite_frame_uuids': used_sprite_frames,
+            'shared_assets': shared_assets,
+            'outputs': [emitter.filename for emitter in emitters]}
+
+
+def print_profile(filename, emitters):
+    '''--profile report of the scene that was just converted'''
+    print("%s: profile" % filename)
+    print("    phases: %s (total %.3fs)" % (
+        ', '.join('%s %.3fs' % (p, g_ctx.phase_times.get(p, 0)) for p in PHASES),
+        sum(g_ctx.phase_times.values())))
+    print("    nodes: %d (%s)" % (
+        sum(g_ctx.node_counts.values()),
+        ', '.join('%s %d' % (k, g_ctx.node_counts[k]) for k in sorted(g_ctx.node_counts))))
+    for emitter in emitters:
+        data = emitter.getvalue()
+        if emitter.binary:
+            print("    %s: %d bytes" % (emitter.filename, len(data)))
+        else:
+            print("    %s: %d lines, %d bytes" % (emitter.filename, data.count('\n'), len(data.encode('utf-8'))))
+
+
+def run_job(args):
+    '''multiprocessing entry point. args is a (filename, assetpath, settings, options) tuple'''
+    filename, assetpath, settings, options = args
+    if options is not None and options.get('cprofile'):
+        profiler = cProfile.Profile()
+        entry = profiler.runcall(run, filename, assetpath, settings, options)
+        profile_filename = os.path.join(options['cprofile'], os.path.splitext(os.path.basename(filename))[0] + '.prof')
+        profiler.dump_stats(profile_filename)
+        logger.info("%s: cProfile stats saved to %s", filename, profile_filename)
+        return entry
+    return run(filename, assetpath, settings, options)
+
+
+def run_all(filenames, assetpath, jobs, force=False, options=None):
+    '''converts the scenes whose inputs changed since the last run (all of
+       them if force is True), using `jobs` processes when jobs > 1.
+       options: dict with the rest of the command line options
+    '''
+    settings = get_build_settings(assetpath, options)
+    manifests = {}
+    todo = []
+    for path in sorted(set(os.path.dirname(f) for f in filenames)):
+        # also refreshes the asset index once, instead of once per worker
+        globals_init()
+        populate_asset_tables(path)
+        manifests[path] = load_manifest(get_manifest_filename(path))
+        for f in filenames:
+            if os.path.dirname(f) != path:
+                continue
+            if not force and scene_is_up_to_date(manifests[path]['scenes'].get(f), f, settings):
+                logger.info("%s: up to date. Skipping it", f)
+            else:
+                todo.append(f)
+
+    convert_scenes(todo, assetpath, settings, options, jobs, manifests)
+
+    if options is not None and options.get('shared_assets'):
+        stale = run_shared_assets(filenames, assetpath, manifests, options)
+        if stale:
+            # e.g. their sprite frames were packed in other atlas pages
+            logger.info("Converting again the scenes that use other textures from creator_assets.cpp: %s", ', '.join(stale))
+            convert_scenes(stale, assetpath, settings, options, jobs, manifests)
+
+
+def convert_scenes(todo, assetpath, settings, options, jobs, manifests):
+    '''converts the scenes `todo` and saves their entries in `manifests`'''
+    done = []
+    try:
+        if jobs > 1 and len(todo) > 1:
+            pool = multiprocessing.Pool(min(jobs, len(todo)))
+            errors = []
+            try:
+                results = [(f, pool.apply_async(run_job, ((f, assetpath, settings, options),))) for f in todo]
+                # the scenes converted by the other workers are kept if one fails
+                for f, result in results:
+                    try:
+                        done.append((f, result.get()))
+                    except Exception as e:
+                        logger.error("%s: %s", f, e)
+                        errors.append(e)
+            finally:
+                pool.close()
+                pool.join()
+            if errors:
+                raise errors[0]
+        else:
+            for f in todo:
+                done.append((f, run_job((f, assetpath, settings, options))))
+    finally:
+        # save what was converted, even if a scene failed
+        for f, entry in done:
+            manifests[os.path.dirname(f)]['scenes'][f] = entry
+        for path in manifests:
+            save_manifest(get_manifest_filename(path), manifests[path])
+
+
+def run_shared_assets(filenames, assetpath, manifests, options):
+    '''generates creator_assets.cpp with the sprite frames of all the
+       scenes, including the ones that were up to date. Returns the scenes
+       converted with other textures for their sprite frames than the ones
+       it registers
+    '''
+    paths = manifests.keys()
+    if len(paths) != 1:
+        raise Exception("--shared-assets: all the scenes must be in the same directory. Found: %s" % ', '.join(sorted(paths)))
+    path = paths[0]
+
+    # union of what each scene uses. None means all of them
+    used_sprite_frames = set()
+    for f in filenames:
+        uuids = manifests[path]['scenes'][f]['sprite_frame_uuids']
+        if uuids is None:
+            used_sprite_frames = None
+            break
+        used_sprite_frames.update(uuids)
+
+    globals_init()
+    g_ctx.assetpath = assetpath
+    g_ctx.options = options
+    for emitter in to_cpp_shared_assets(path, used_sprite_frames):
+        if not emitter.commit():
+            logger.info("%s: unchanged", emitter.filename)
+
+    # read by the scenes in load_shared_assets()
+    manifests[path]['shared_assets'] = {'sprite_frame_textures': g_ctx.sprite_frame_textures,
+                                        'texture_sizes': g_ctx.texture_sizes}
+    save_manifest(get_manifest_filename(path), manifests[path])
+
+    stale = []
+    for f in filenames:
+        entry = manifests[path]['scenes'][f]
+        if entry.get('shared_assets') != get_shared_assets_digest(entry['sprite_frame_uuids']):
+            stale.append(f)
+    return stale
+
+
+def get_watch_stamps(filenames):
+    '''stamps of the files that can change the generated code: the scenes,
+       everything in their asset trees, library/uuid-to-mtime.json and the
+       dependencies recorded in the build manifests
+    '''
+    watched = set(filenames)
+    for path in set(os.path.dirname(f) for f in filenames):
+        for dirpath, dirnames, dir_filenames in os.walk(path or '.'):
+            watched.update(os.path.join(dirpath, f) for f in dir_filenames)
+        watched.add(path + '/../library/uuid-to-mtime.json')
+        for entry in load_manifest(get_manifest_filename(path))['scenes'].values():
+            watched.update(entry['deps'])
+    watched.update(glob.glob('temp/*/*/*.meta'))
+    stamps = {}
+    for filename in watched:
+        try:
+            stamps[filename] = get_file_stamp(filename)
+        except OSError:
+            # deleted while listing it
+            pass
+    return stamps
+
+
+def watch_new_dependencies(filenames, stamps):
+    '''adds to `stamps` the files that are watched since the last
+       conversion, e.g. the dependencies it added to the build manifests.
+       The stamps of the files already watched are kept, so the changes
+       made during the conversion are seen by the next poll
+    '''
+    for filename, stamp in get_watch_stamps(filenames).items():
+        stamps.setdefault(filename, stamp)
+
+
+def watch(filenames, assetpath, force=False, options=None):
+    '''converts the scenes, then polls their inputs and converts again the
+       ones affected by each change, until interrupted with Ctrl-C.
+       The asset indexes and the loaded scenes are kept in memory
+    '''
+    global g_memory_cache
+    g_memory_cache = {'indexes': {}, 'scenes': {}}
+
+    stamps = get_watch_stamps(filenames)
+    run_all(filenames, assetpath, 1, force, options)
+    watch_new_dependencies(filenames, stamps)
+    logger.warning("Watching %d scenes. Press Ctrl-C to stop", len(filenames))
+    try:
+        while True:
+            time.sleep(WATCH_INTERVAL)
+            new_stamps = get_watch_stamps(filenames)
+            if new_stamps == stamps:
+                continue
+            changed = sorted(f for f in set(stamps) | set(new_stamps) if stamps.get(f) != new_stamps.get(f))
+            stamps = new_stamps
+            logger.warning("Changed: %s", ', '.join(changed))
+
+            start = time.time()
+            try:
+                run_all(filenames, assetpath, 1, False, options)
+            except Exception:
+                # e.g. a file saved while it was being read. The next change retries
+                logger.exception("Conversion failed")
+                continue
+            end = time.time()
+            watch_new_dependencies(filenames, stamps)
+            # from the last save, as seen by the file system
+            last_change = max([new_stamps[f][0] for f in changed if f in new_stamps] or [start])
+            logger.warning("Rebuilt in %d ms (%d ms after the change)", (end - start) * 1000, max(end - last_change, 0) * 1000)
+    except KeyboardInterrupt:
+        pass
 
 
 def help():
     print("%s v0.1 - parses Cocos Creator project files\n" % os.path.basename(sys.argv[0]))
     print("Example:\n%s --assetpath creator_assets assets/*.fire" % os.path.basename(sys.argv[0]))
+    print("\nOptions:")
+    print("  -p, --assetpath PATH    prefix used for the assets in the generated code")
+    print("  -j, --jobs N            convert N scenes in parallel (default: 1)")
+    print("  -f, --force             convert all the scenes, even the ones that didn't change")
+    print("  --low-memory            load the scenes incrementally, keeping only the needed fields")
+    print("  --all-sprite-frames     register all the sprite frames, not only the ones used by the scene")
+    print("  --binary                serialize the scenes to cpp/<scene>.bin, loaded by creator_scene_loader.cpp.")
+    print("                          Copy the .bin files with the assets")
+    print("  --shared-assets         register the sprite frames of all the scenes once, in creator_assets.cpp,")
+    print("                          instead of in every <scene>_init()")
+    print("  --pack-atlas            pack the sprite frames that are not in an atlas into cpp/<scene>_atlas<n>.png.")
+    print("                          Needs PIL. Copy the .png files with the assets")
+    print("  --time-sliced N         create the nodes by chunks of N. <scene>_create_async() creates a few chunks")
+    print("                          per frame, so big scenes don't block the main thread. Not with --binary")
+    print("  --virtual-scrollviews N only create the items of the ScrollViews with N items or more that are")
+    print("                          in the view, and reuse them (creator_virtual_list.cpp). Not with --binary")
+    print("  --reorder-siblings      reorder the siblings that don't overlap to batch the sprites of the same")
+    print("                          texture. The estimated draw calls are shown before and after")
+    print("  --report                write cpp/<scene>_report.json: estimated draw calls and texture switches,")
+    print("                          texture memory, overdraw, dropped nodes and labels with a system font")
+    print("  --profile               print the time of each phase, the parsed nodes and the size of the outputs")
+    print("                          of the converted scenes (use -f to convert all of them)")
+    print("  --cprofile DIR          save the cProfile stats of each converted scene to DIR/<scene>.prof")
+    print("  -w, --watch             convert the scenes again each time their inputs change, until Ctrl-C")
+    print("                          (runs in a single process)")
+    print("  -v, --verbose           show the messages about each node")
+    print("  -q, --quiet             only show the warnings")
     sys.exit(-1)
 
 
@@ -963,17 +3981,67 @@ if __name__ == "__main__":
         help()
 
     assetpath = ""
+    jobs = 1
+    force = False
+    watching = False
+    options = {}
+    level = logging.INFO
     argv = sys.argv[1:]
     try:
-        opts, args = getopt.getopt(argv, "p:", ["assetpath="])
+        opts, args = getopt.getopt(argv, "p:j:fwvq", ["assetpath=", "jobs=", "force", "low-memory", "all-sprite-frames", "binary", "shared-assets", "pack-atlas",
+            "time-sliced=", "virtual-scrollviews=", "reorder-siblings", "report", "profile", "cprofile=", "watch", "verbose", "quiet"])
         for opt, arg in opts:
             if opt in ("-p", "--assetpath"):
                 assetpath = arg
                 if assetpath[-1] != '/':
                     assetpath += '/'
-
-        for f in args:
-            run(f, assetpath)
+            elif opt in ("-j", "--jobs"):
+                jobs = int(arg)
+            elif opt in ("-f", "--force"):
+                force = True
+            elif opt == "--low-memory":
+                options['low_memory'] = True
+            elif opt == "--all-sprite-frames":
+                options['all_sprite_frames'] = True
+            elif opt == "--binary":
+                options['binary'] = True
+            elif opt == "--shared-assets":
+                options['shared_assets'] = True
+            elif opt == "--pack-atlas":
+                options['pack_atlas'] = True
+            elif opt == "--reorder-siblings":
+                options['reorder_siblings'] = True
+            elif opt == "--virtual-scrollviews":
+                options['virtual_scrollviews'] = int(arg)
+                if options['virtual_scrollviews'] <= 0:
+                    raise getopt.GetoptError("--virtual-scrollviews needs a number of items > 0")
+            elif opt == "--time-sliced":
+                options['time_sliced'] = int(arg)
+                if options['time_sliced'] <= 0:
+                    raise getopt.GetoptError("--time-sliced needs a number of nodes > 0")
+            elif opt == "--report":
+                options['report'] = True
+            elif opt == "--profile":
+                options['profile'] = True
+            elif opt == "--cprofile":
+                options['cprofile'] = arg
+            elif opt in ("-w", "--watch"):
+                watching = True
+            elif opt in ("-v", "--verbose"):
+                level = logging.DEBUG
+            elif opt in ("-q", "--quiet"):
+                level = logging.WARNING
+
+        if options.get('binary') and options.get('time_sliced'):
+            raise getopt.GetoptError("--time-sliced can't be used with --binary")
+        if options.get('binary') and options.get('virtual_scrollviews'):
+            raise getopt.GetoptError("--virtual-scrollviews can't be used with --binary")
+
+        logging.basicConfig(format='%(message)s', level=level)
+        if watching:
+            watch(args, assetpath, force, options)
+        else:
+            run_all(args, assetpath, jobs, force, options)
     except getopt.GetoptError, e:
         print(e)
 
@@ -0,0 +1,43 @@
+#!/usr/bin/python
+# ----------------------------------------------------------------------------
+# Asset index: library/creator-parser-index.json
+# ----------------------------------------------------------------------------
+from __future__ import division, unicode_literals, print_function
+import os
+import imp
+import shutil
+import tempfile
+import unittest
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# parser.py would be shadowed by the built-in 'parser' module
+creator_parser = imp.load_source('creator_parser', os.path.join(ROOT, 'parser.py'))
+
+
+class AssetIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.workdir, 'assets')
+        os.mkdir(self.path)
+        os.mkdir(os.path.join(self.workdir, 'library'))
+        shutil.copy(os.path.join(ROOT, 'library', 'uuid-to-mtime.json'), os.path.join(self.workdir, 'library'))
+        creator_parser.globals_init()
+        creator_parser.g_ctx.path = self.path
+
+    def tearDown(self):
+        shutil.rmtree(self.workdir)
+
+    def test_no_index_and_no_metas(self):
+        creator_parser.populate_asset_tables(self.path)
+        self.assertTrue(os.path.isfile(creator_parser.get_asset_index_filename(self.path)))
+        self.assertEqual(creator_parser.g_ctx.sprite_frames, {})
+
+        # warm: the tables come from the index
+        creator_parser.globals_init()
+        creator_parser.populate_asset_tables(self.path)
+        self.assertEqual(creator_parser.g_ctx.sprite_frames, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+#!/usr/bin/python
+# ----------------------------------------------------------------------------
+# Texture Packer atlases read at build time
+# ----------------------------------------------------------------------------
+'''
+The frames of assets/ui.plist have no rawTextureUuid in their .meta: their
+texture comes from the metadata of the .plist
+'''
+from __future__ import division, unicode_literals, print_function
+import os
+import imp
+import shutil
+import tempfile
+import unittest
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# parser.py would be shadowed by the built-in 'parser' module
+creator_parser = imp.load_source('creator_parser', os.path.join(ROOT, 'parser.py'))
+
+
+class AtlasPlistTest(unittest.TestCase):
+    def setUp(self):
+        # the asset index is written to library/
+        self.workdir = tempfile.mkdtemp()
+        for d in ('assets', 'library'):
+            shutil.copytree(os.path.join(ROOT, d), os.path.join(self.workdir, d))
+        self.path = os.path.join(self.workdir, 'assets')
+
+        creator_parser.globals_init()
+        creator_parser.g_ctx.path = self.path
+        creator_parser.g_ctx.assetpath = 'creator_assets/'
+        creator_parser.populate_asset_tables(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.workdir)
+
+    def emit_sprite_frames(self):
+        creator_parser.g_ctx.cpp = creator_parser.Emitter(None)
+        creator_parser.to_cpp_setup_sprite_frames('Test')
+        return creator_parser.g_ctx.cpp.getvalue()
+
+    def test_texture_from_plist(self):
+        frames = creator_parser.load_atlas_plist('ui.plist')
+        self.assertEqual(len(frames), 9)
+        self.assertEqual(creator_parser.g_ctx.atlas_textures['ui.plist'], 'ui.png')
+
+        code = self.emit_sprite_frames()
+        self.assertIn('// creator_assets/ui.plist read at build time', code)
+        self.assertNotIn('addSpriteFramesWithFile', code)
+        # rotated in the .plist (format 2)
+        self.assertIn('auto sf_button_actived_png = SpriteFrame::create("creator_assets/ui.png", '
+                      'Rect(113, 55, 21, 13), true, Vec2(0, 0), Size(21, 13));', code)
+        for name in frames:
+            self.assertIn('spriteFrameCache->addSpriteFrame(sf_%s, "%s");' % (name.replace('.', '_'), name), code)
+
+    def test_plist_loaded_at_runtime_without_texture(self):
+        os.remove(os.path.join(self.path, 'ui.png'))
+
+        code = self.emit_sprite_frames()
+        self.assertIn('spriteFrameCache->addSpriteFramesWithFile("creator_assets/ui.plist");', code)
+        self.assertNotIn('ui.plist read at build time', code)
+        self.assertNotIn('sf_button_actived_png', code)
+
+
+if __name__ == '__main__':
+    unittest.main()
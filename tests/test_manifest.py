@@ -0,0 +1,46 @@
+#!/usr/bin/python
+# ----------------------------------------------------------------------------
+# Build manifest: library/creator-parser-manifest.json
+# ----------------------------------------------------------------------------
+from __future__ import division, unicode_literals, print_function
+import os
+import imp
+import shutil
+import tempfile
+import unittest
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# parser.py would be shadowed by the built-in 'parser' module
+creator_parser = imp.load_source('creator_parser', os.path.join(ROOT, 'parser.py'))
+
+
+class ManifestTest(unittest.TestCase):
+    def setUp(self):
+        # the scenes are written to cpp/, in the current directory
+        self.cwd = os.getcwd()
+        self.workdir = tempfile.mkdtemp()
+        for d in ('assets', 'library'):
+            shutil.copytree(os.path.join(ROOT, d), os.path.join(self.workdir, d))
+        os.chdir(self.workdir)
+        index_filename = creator_parser.get_asset_index_filename('assets')
+        if os.path.exists(index_filename):
+            os.remove(index_filename)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.workdir)
+
+    def test_dependencies_of_cold_and_warm_runs(self):
+        for scene, dependencies in (('CreatorLabels', ('assets/arial16.png', 'assets/ui.png')),
+                                    ('CreatorTest1', ('assets/iso-test.png', 'assets/Galaxy.plist'))):
+            # the 1st run builds the asset index, the 2nd one reads it
+            cold = creator_parser.run('assets/%s.fire' % scene, 'creator_assets/')
+            warm = creator_parser.run('assets/%s.fire' % scene, 'creator_assets/')
+            self.assertEqual(cold['deps'], warm['deps'])
+            for dependency in dependencies:
+                self.assertIn(dependency, warm['deps'])
+
+
+if __name__ == '__main__':
+    unittest.main()